@@ -0,0 +1,65 @@
+r"""
+Benchmark of columnar record batches against mapper instances
+run from the repo root: PYTHONPATH=src python benchmarks/bench_columnar.py
+"""
+import tracemalloc
+from datetime import date, timedelta
+from time import perf_counter
+
+from rtk.common.base import MapperBase
+from rtk.common.columnar import RecordBatch, np
+from rtk.common.meta import Field, FieldType
+
+
+class Position(MapperBase):
+    quantity = Field(type_=FieldType.Integer)
+    price = Field(type_=FieldType.Float)
+    notional = Field(type_=FieldType.Float)
+    trade_date = Field(type_=FieldType.Date)
+    maturity = Field(type_=FieldType.Date)
+
+
+def make_rows(count):
+    start = date(2019, 1, 1)
+    return [Position(quantity=i, price=i * 0.25, notional=i * 1000.0, trade_date=start + timedelta(days=i % 365),
+                     maturity=start + timedelta(days=i % 3650)).generate() for i in range(count)]
+
+
+def timed(func):
+    start = perf_counter()
+    result = func()
+    return result, perf_counter() - start
+
+
+def allocated(func):
+    """bytes allocated by func and still held"""
+    tracemalloc.start()
+    result = func()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def bench(count=100000):
+    print('backend: {}, {} records'.format('numpy' if np is not None else 'array', count))
+    rows = make_rows(count)
+    instances, load_instances = timed(lambda: Position.build_many(dict(row) for row in rows))
+    batch, load_batch = timed(lambda: RecordBatch.from_dicts(Position, rows))
+    _, dump_instances = timed(lambda: Position.generate_many(instances))
+    _, dump_batch = timed(batch.to_dicts)
+    _, read_instances = timed(lambda: [instance.trade_date for instance in instances])
+    _, read_batch = timed(lambda: batch.values('trade_date'))
+    instances_size = allocated(lambda: Position.build_many(dict(row) for row in rows))
+    batch_size = allocated(lambda: RecordBatch.from_dicts(Position, rows))
+
+    print('{:<16}{:>14}{:>14}'.format('', 'instances', 'batch'))
+    print('{:<16}{:>14.1f}{:>14.1f}'.format('bytes/record', instances_size / count, batch_size / count))
+    print('{:<16}{:>14.3f}{:>14.3f}'.format('load (s)', load_instances, load_batch))
+    print('{:<16}{:>14.3f}{:>14.3f}'.format('to dicts (s)', dump_instances, dump_batch))
+    print('{:<16}{:>14.3f}{:>14.3f}'.format('read date (s)', read_instances, read_batch))
+    print('(generate_many returns the dicts held by the instances, to_dicts builds new ones)')
+
+
+if __name__ == '__main__':
+    bench()
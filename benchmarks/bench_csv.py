@@ -0,0 +1,214 @@
+r"""
+Benchmarks of rtk.common.csvutil
+run from the repo root: PYTHONPATH=src python benchmarks/bench_csv.py
+"""
+import bz2
+import gzip
+import lzma
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from time import perf_counter
+
+from rtk.common.csvutil import ColumnPredicate, RecordParserBase, build_section_index, load_sections, process_csv
+from rtk.common.meta import FieldType
+
+DATE_FORMAT = '%Y/%m/%d'
+DATE_DELIMITER = ', '
+
+
+class TruncateDates(RecordParserBase):
+    """drop the dates after End Date, like the epsilon processor"""
+    def process_record(self, record, col_lookup):
+        end_date = datetime.strptime(record[col_lookup['End Date']], DATE_FORMAT)
+        index = col_lookup['Dates']
+        record[index] = DATE_DELIMITER.join(date for date in record[index].split(DATE_DELIMITER)
+                                            if datetime.strptime(date, DATE_FORMAT) <= end_date)
+
+
+def write_synthetic(path, sections=50, rows=2000):
+    start = datetime(2019, 1, 1)
+    dates = DATE_DELIMITER.join((start + timedelta(days=30 * i)).strftime(DATE_FORMAT) for i in range(12))
+    with open(path, 'w') as file:
+        for section in range(sections):
+            file.write('Section {},ID,End Date,Dates,Notional\n'.format(section))
+            for row in range(rows):
+                end_date = (start + timedelta(days=row % 360)).strftime(DATE_FORMAT)
+                file.write(',:EPSILON.EpsilonTRS S{}-{},{},"{}",{}\n'.format(section, row, end_date, dates, row * 100))
+
+
+def timed(func):
+    start = perf_counter()
+    func()
+    return perf_counter() - start
+
+
+def bench_workers(sections=50, rows=2000):
+    with tempfile.TemporaryDirectory() as work_dir:
+        input_path = os.path.join(work_dir, 'input.csv')
+        output_path = os.path.join(work_dir, 'output.csv')
+        write_synthetic(input_path, sections, rows)
+        print('{} records, {} cores'.format(sections * rows, os.cpu_count()))
+        print('{:<12}{:>14}{:>14}'.format('workers', 'seconds', 'speed up'))
+        serial = None
+        workers = 1
+        while workers <= (os.cpu_count() or 1):
+            elapsed = timed(lambda: process_csv(input_path, output_file_path=output_path,
+                                                record_parser=TruncateDates(), multiple_header=True,
+                                                workers=workers))
+            serial = serial or elapsed
+            print('{:<12}{:>14.3f}{:>14.2f}'.format(workers, elapsed, serial / elapsed))
+            workers *= 2
+
+
+class RewriteFew(RecordParserBase):
+    """rewrite End Date of the records whose ID ends with the suffix, like the epsilon processor"""
+    columns = ('ID', 'End Date')
+
+    def __init__(self, suffix='-00'):
+        super().__init__(suffix=suffix)
+
+    def process_record(self, record, col_lookup):
+        if record[col_lookup['ID']].endswith(self.suffix):
+            record[col_lookup['End Date']] = '2019/11/01'
+
+
+def bench_projection(sections=50, rows=2000):
+    with tempfile.TemporaryDirectory() as work_dir:
+        input_path = os.path.join(work_dir, 'input.csv')
+        output_path = os.path.join(work_dir, 'output.csv')
+        write_synthetic(input_path, sections, rows)
+        print('{} records, 1% rewritten'.format(sections * rows))
+        print('{:<12}{:>14}'.format('reader', 'seconds'))
+        for label, columns in (('text', None), ('mmap', RewriteFew.columns)):
+            elapsed = timed(lambda: process_csv(input_path, output_file_path=output_path, record_parser=RewriteFew(),
+                                                multiple_header=True, columns=columns))
+            print('{:<12}{:>14.3f}'.format(label, elapsed))
+
+
+class RewriteSelected(RecordParserBase):
+    """rewrite End Date of the records with selected Notional, testing it in process_record"""
+    def __init__(self, modulo):
+        super().__init__(modulo=modulo * 100)
+
+    def selected(self, notional):
+        return int(notional) % self.modulo == 0
+
+    def process_record(self, record, col_lookup):
+        if self.selected(record[col_lookup['Notional']]):
+            record[col_lookup['End Date']] = '2019/11/01'
+
+
+class PushedDownSelected(RewriteSelected):
+    """RewriteSelected declaring its columns and predicate"""
+    columns = ('End Date',)
+
+    def __init__(self, modulo):
+        super().__init__(modulo)
+        self.predicate = ColumnPredicate('Notional', self.selected)
+
+    def process_record(self, record, col_lookup):
+        record[col_lookup['End Date']] = '2019/11/01'
+
+
+def bench_selectivity(sections=50, rows=2000):
+    with tempfile.TemporaryDirectory() as work_dir:
+        input_path = os.path.join(work_dir, 'input.csv')
+        output_path = os.path.join(work_dir, 'output.csv')
+        write_synthetic(input_path, sections, rows)
+        print('{} records'.format(sections * rows))
+        print('{:<12}{:>14}{:>14}'.format('selectivity', 'text', 'pushed down'))
+        for modulo in (100, 10, 1):
+            text = timed(lambda: process_csv(input_path, output_file_path=output_path,
+                                             record_parser=RewriteSelected(modulo), multiple_header=True))
+            pushed_down = timed(lambda: process_csv(input_path, output_file_path=output_path,
+                                                    record_parser=PushedDownSelected(modulo), multiple_header=True))
+            print('{:<12}{:>14.3f}{:>14.3f}'.format('{}%'.format(100 // modulo), text, pushed_down))
+
+def bench_compression(sections=50, rows=2000):
+    with tempfile.TemporaryDirectory() as work_dir:
+        input_path = os.path.join(work_dir, 'input.csv')
+        output_path = os.path.join(work_dir, 'output.csv')
+        write_synthetic(input_path, sections, rows)
+        print('{} records'.format(sections * rows))
+        print('{:<12}{:>18}{:>14}'.format('codec', 'decompress first', 'streaming'))
+        for extension, module in (('.gz', gzip), ('.bz2', bz2), ('.xz', lzma)):
+            compressed_path = input_path + extension
+            with open(input_path, 'rb') as source, module.open(compressed_path, 'wb') as target:
+                shutil.copyfileobj(source, target)
+
+            def decompress_first():
+                decompressed_path = os.path.join(work_dir, 'decompressed.csv')
+                with module.open(compressed_path, 'rb') as source, open(decompressed_path, 'wb') as target:
+                    shutil.copyfileobj(source, target)
+                process_csv(decompressed_path, output_file_path=output_path, record_parser=RewriteFew(),
+                            multiple_header=True)
+                os.remove(decompressed_path)
+
+            first = timed(decompress_first)
+            streaming = timed(lambda: process_csv(compressed_path, output_file_path=output_path,
+                                                  record_parser=RewriteFew(), multiple_header=True))
+            print('{:<12}{:>18.3f}{:>14.3f}'.format(extension, first, streaming))
+
+
+class CollectRows(RecordParserBase):
+    """keep the records of each section, to build the columns by hand"""
+    def __init__(self):
+        super().__init__(sections=[])
+
+    def process_record(self, record, col_lookup):
+        self.sections[-1].append(list(record))
+
+    def section_done(self):
+        self.sections.append([])
+
+
+def bench_load(sections=50, rows=2000):
+    schema = {'End Date': FieldType.Date, 'Notional': FieldType.Integer}
+
+    def by_hand():
+        parser = CollectRows()
+        process_csv(input_path, record_parser=parser, multiple_header=True)
+        for records in parser.sections:
+            columns = list(zip(*records))
+            [datetime.strptime(value, DATE_FORMAT).date() for value in columns[2]]
+            list(map(int, columns[4]))
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        input_path = os.path.join(work_dir, 'input.csv')
+        write_synthetic(input_path, sections, rows)
+        print('{} records'.format(sections * rows))
+        print('{:<16}{:>14}'.format('loader', 'seconds'))
+        print('{:<16}{:>14.3f}'.format('rows by hand', timed(by_hand)))
+        elapsed = timed(lambda: list(load_sections(input_path, schema, date_format=DATE_FORMAT)))
+        print('{:<16}{:>14.3f}'.format('load_sections', elapsed))
+
+
+def bench_sections(sections=200, rows=500):
+    with tempfile.TemporaryDirectory() as work_dir:
+        input_path = os.path.join(work_dir, 'input.csv')
+        output_path = os.path.join(work_dir, 'output.csv')
+        write_synthetic(input_path, sections, rows)
+        print('{} sections of {} records, 2 selected'.format(sections, rows))
+        print('{:<16}{:>14}'.format('run', 'seconds'))
+        print('{:<16}{:>14.3f}'.format('whole file', timed(lambda: process_csv(
+            input_path, output_file_path=output_path, record_parser=TruncateDates(), multiple_header=True))))
+        print('{:<16}{:>14.3f}'.format('build index', timed(lambda: build_section_index(input_path))))
+        print('{:<16}{:>14.3f}'.format('2 sections', timed(lambda: process_csv(
+            input_path, output_file_path=output_path, record_parser=TruncateDates(), multiple_header=True,
+            sections=['Section 7', 'Section 150']))))
+
+
+if __name__ == '__main__':
+    bench_workers()
+    print()
+    bench_projection()
+    print()
+    bench_selectivity()
+    print()
+    bench_compression()
+    print()
+    bench_load()
+    print()
+    bench_sections()
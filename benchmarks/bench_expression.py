@@ -0,0 +1,96 @@
+r"""
+Benchmarks of rtk.common.expression
+run from the repo root: PYTHONPATH=src python benchmarks/bench_expression.py
+"""
+from random import random
+from time import sleep
+from timeit import timeit
+
+from rtk.common.expression import BatchResolver, Expression
+
+NUMBER = 100000
+
+EXPRESSIONS = (
+    ('simple', '${aa} + ${bb}'),
+    ('repeated vars', '${aa} if ${aa} == ${bb} else ${bb}'),
+    ('function', 'run_func(${aa}, ${bb})'),
+)
+
+
+def run_func(a, b):
+    return a + b
+
+
+def bench_evaluate(number=NUMBER):
+    print('{:<16}{:>16}{:>16}'.format('expression', 'evaluations/s', 'construct/s'))
+    functions = {'run_func': run_func}
+    for label, string in EXPRESSIONS:
+        expression = Expression(string)
+        evaluate = timeit(lambda: expression(functions, aa=1, bb=2), number=number)
+        construct = timeit(lambda: Expression(string), number=number // 10)
+        print('{:<16}{:>16,.0f}{:>16,.0f}'.format(label, number / evaluate, number // 10 / construct))
+
+
+def bench_batch(rows=100000):
+    columns = {'qty': [int(random() * 100) for _ in range(rows)], 'price': [random() * 10 for _ in range(rows)]}
+    print('{} rows'.format(rows))
+    print('{:<28}{:>10}{:>12}{:>12}'.format('expression', 'path', 'per row', 'batch'))
+    for string in ('${qty} * ${price}', '${qty} * ${price} if ${qty} > 50 and ${price} < 5 else 0',
+                   'round(${price}, 1)'):
+        expression = Expression(string)
+        functions = {'round': round}
+        per_row = timeit(lambda: [expression(functions, qty=qty, price=price)
+                                  for qty, price in zip(columns['qty'], columns['price'])], number=1)
+        path = expression.evaluate_batch(columns, functions).path
+        batch = timeit(lambda: expression.evaluate_batch(columns, functions), number=1)
+        print('{:<28}{:>10}{:>12.3f}{:>12.3f}'.format(string[:26], path, per_row, batch))
+
+
+def slow_lookup(config_var, data_context):
+    sleep(0.0001)  # e.g. a reference data lookup
+    return data_context.get(config_var.split('.', 1)[1], 0)
+
+
+def bench_lazy(number=2000):
+    Expression.register_resolver('ref', slow_lookup)
+    print('{:<48}{:>16}'.format('expression', 'evaluations/s'))
+    for string in ('${ref.a} + ${ref.b}', '${ref.a} if ${flag} else ${ref.b} * ${ref.b}',
+                   '${ref.a} * (60 * 60 * 24) if 2 > 1 else ${ref.b}'):
+        expression = Expression(string)
+        elapsed = timeit(lambda: expression(a=1, b=2, flag=True), number=number)
+        print('{:<48}{:>16,.0f}'.format(string, number / elapsed))
+
+
+class RoundTrip(BatchResolver):
+    """one simulated round trip of 1 ms per fetch, whatever the number of rows"""
+    def fetch(self, config_vars, data_contexts):
+        sleep(0.001)
+        return {config_var: [data_context['id'] % 7 for data_context in data_contexts] for config_var in config_vars}
+
+    def cache_key(self, data_context):
+        return data_context['id']
+
+
+def bench_batch_resolver(rows=1000):
+    contexts = [{'id': index % 100, 'qty': index} for index in range(rows)]
+    print('{} rows, 100 distinct ids'.format(rows))
+    print('{:<28}{:>12}'.format('evaluation', 'seconds'))
+    for label, resolver, many in (('per row', RoundTrip(), False), ('evaluate_many', RoundTrip(), True),
+                                  ('evaluate_many, ttl cache', RoundTrip(ttl=60), True)):
+        Expression.register_resolver('db', resolver)
+        expression = Expression('${db.factor} * ${qty} + ${db.offset}')
+        if many:
+            elapsed = timeit(lambda: expression.evaluate_many(contexts), number=3) / 3
+        else:
+            elapsed = timeit(lambda: [expression(**context) for context in contexts], number=1)
+        print('{:<28}{:>12.4f}'.format(label, elapsed))
+
+
+if __name__ == '__main__':
+    bench_evaluate()
+    print()
+    bench_batch()
+    print()
+    bench_lazy()
+    print()
+    bench_batch_resolver()
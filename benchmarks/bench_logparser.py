@@ -0,0 +1,115 @@
+r"""
+Benchmarks of snippet.logparser
+run from the repo root: PYTHONPATH=src python benchmarks/bench_logparser.py
+"""
+import os
+import random
+import tempfile
+import tracemalloc
+from datetime import datetime, timedelta
+from time import perf_counter
+from timeit import timeit
+
+from snippet.logparser import (CompactRecordSet, LogIndex, LogRecord, RecordSet, parse_timestamp,
+                               parse_timestamp_micros)
+
+SEVERITIES = ('INFO', 'INFO', 'INFO', 'DEBUG', 'WARNING', 'ERROR')
+
+
+def write_log(path, records=200000, seed=1):
+    rng = random.Random(seed)
+    timestamp = datetime(2019, 11, 1)
+    with open(path, 'w') as file:
+        for index in range(records):
+            timestamp += timedelta(milliseconds=rng.randint(0, 400))
+            file.write('{}{:03d}: {:<7} : [{}] : calc step {} done in {} ms\n'.format(
+                timestamp.strftime('%d %b %Y, %H:%M:%S.'), timestamp.microsecond // 1000, rng.choice(SEVERITIES),
+                rng.choice((101, 202, 303, 404)), index, rng.randint(1, 999)))
+            if index % 50 == 0:
+                file.write('    Traceback line of record {}\n'.format(index))
+
+
+def timed(func):
+    start = perf_counter()
+    result = func()
+    return perf_counter() - start, result
+
+
+def bench_index(records=200000):
+    criteria = dict(time_range='2019-11-01 02:00:00,2019-11-01 02:10:00', severity='ERROR')
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, 'calc_log_eod_inst1_20191101.log')
+        write_log(path, records)
+        print('{} records, {:.1f} MB'.format(records, os.path.getsize(path) / 1e6))
+        print('{:<34}{:>10}{:>10}'.format('query', 'seconds', 'records'))
+        elapsed, result = timed(lambda: RecordSet.from_file(path).where(**criteria))
+        print('{:<34}{:>10.3f}{:>10}'.format('from_file + where', elapsed, len(result)))
+        elapsed, index = timed(lambda: LogIndex.build(path))
+        print('{:<34}{:>10.3f}{:>10}'.format('build index (once)', elapsed, len(index)))
+        elapsed, result = timed(lambda: RecordSet.from_file(path, **criteria))
+        print('{:<34}{:>10.3f}{:>10}'.format('from_file(criteria), indexed', elapsed, len(result)))
+        elapsed, result = timed(lambda: RecordSet.from_file(path, pid=101, severity='WARNING'))
+        print('{:<34}{:>10.3f}{:>10}'.format('pid + severity scan, indexed', elapsed, len(result)))
+
+
+def bench_parallel(files=4, records=100000):
+    with tempfile.TemporaryDirectory() as work_dir:
+        paths = [os.path.join(work_dir, 'calc_log_eod_inst{}_20191101.log'.format(index)) for index in range(files)]
+        for seed, path in enumerate(paths):
+            write_log(path, records, seed)
+        print('{} files of {} records, {} cores'.format(files, records, os.cpu_count()))
+        print('{:<12}{:>10}{:>10}'.format('workers', 'seconds', 'speed up'))
+        serial, _ = timed(lambda: [RecordSet.from_file(path) for path in paths])
+        print('{:<12}{:>10.3f}{:>10.2f}'.format('serial', serial, 1))
+        workers = 1
+        while workers <= (os.cpu_count() or 1) * 2:
+            elapsed, _ = timed(lambda: RecordSet.load_files(paths, workers))
+            print('{:<12}{:>10.3f}{:>10.2f}'.format(workers, elapsed, serial / elapsed))
+            workers *= 2
+
+
+def bench_timestamps(number=200000):
+    timestamp = datetime(2019, 11, 1, 10, 20, 30)
+    texts = []
+    for _ in range(number):
+        timestamp += timedelta(milliseconds=137)
+        texts.append('{}{:03d}'.format(timestamp.strftime('%d %b %Y, %H:%M:%S.'), timestamp.microsecond // 1000))
+    print('{} timestamps'.format(number))
+    print('{:<24}{:>10}'.format('parser', 'seconds'))
+    for label, parse in (('strptime', lambda text: datetime.strptime(text, LogRecord.TIME_FMT)),
+                         ('parse_timestamp', parse_timestamp), ('parse_timestamp_micros', parse_timestamp_micros)):
+        print('{:<24}{:>10.3f}'.format(label, timeit(lambda: list(map(parse, texts)), number=1)))
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, 'calc_log_eod_inst1_20191101.log')
+        write_log(path, number)
+        for label, epoch_micros in (('from_file', False), ('from_file, epoch_micros', True)):
+            elapsed, _ = timed(lambda: RecordSet.from_file(path, epoch_micros=epoch_micros))
+            print('{:<24}{:>10.3f}'.format(label, elapsed))
+
+
+def bench_memory(records=200000):
+    criteria = dict(time_range='2019-11-01 02:00:00,2019-11-01 10:00:00', severity='ERROR')
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, 'calc_log_eod_inst1_20191101.log')
+        write_log(path, records)
+        print('{} records'.format(records))
+        print('{:<18}{:>16}{:>10}{:>10}'.format('record set', 'bytes / record', 'load', 'where'))
+        for record_set in (RecordSet, CompactRecordSet):
+            tracemalloc.start()
+            load, result = timed(lambda: record_set.from_file(path))
+            size = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            where, _ = timed(lambda: result.where(**criteria))
+            print('{:<18}{:>16.0f}{:>10.3f}{:>10.3f}'.format(record_set.__name__, size / len(result), load, where))
+            del result
+
+
+if __name__ == '__main__':
+    bench_index()
+    print()
+    bench_parallel()
+    print()
+    bench_timestamps()
+    print()
+    bench_memory()
@@ -0,0 +1,164 @@
+r"""
+Micro-benchmarks of the mapper layer
+run from the repo root: PYTHONPATH=src python benchmarks/bench_mapper.py
+"""
+from datetime import date, datetime
+from decimal import Decimal
+import tracemalloc
+from time import perf_counter
+from time import strptime
+from timeit import repeat
+
+from rtk.common.base import MapperBase
+from rtk.common.fields import ListField
+from rtk.common.meta import (DEFAULT_CONVERTER, Field, FieldType, cache_dates, convert_to_python_date,
+                             convert_to_python_datetime)
+
+
+class Compiled(MapperBase):
+    name = Field()
+    desk = Field()
+    book = Field()
+    notional = Field(type_=FieldType.Float)
+    active = Field(type_=FieldType.Boolean)
+
+
+class Descriptor(MapperBase, codec=False):
+    name = Field()
+    desk = Field()
+    book = Field()
+    notional = Field(type_=FieldType.Float)
+    active = Field(type_=FieldType.Boolean)
+
+
+class Compact(MapperBase, compact=True):
+    name = Field()
+    desk = Field()
+    book = Field()
+    notional = Field(type_=FieldType.Float)
+    active = Field(type_=FieldType.Boolean)
+
+
+VALUES = dict(name='swap', desk='rates', book='EUR', notional=1e6, active=True)
+
+
+def best_of(stmt, number=100000):
+    """best time per call in micro seconds"""
+    return min(repeat(stmt, number=number, repeat=5)) / number * 1e6
+
+
+def bench_codec():
+    data = Compiled(**VALUES).generate()
+    print('{:<12}{:>14}{:>14}'.format('us/call', 'descriptor', 'compiled'))
+    for label, stmt in (('__init__', lambda cls: lambda: cls(**VALUES)),
+                        ('build_from', lambda cls: lambda: cls.build_from(data)),
+                        ('generate', lambda cls: cls(**VALUES).generate)):
+        print('{:<12}{:>14.3f}{:>14.3f}'.format(label, best_of(stmt(Descriptor)), best_of(stmt(Compiled))))
+
+
+SAMPLE_VALUES = {
+    FieldType.String: 'swap',
+    FieldType.Integer: 42,
+    FieldType.Float: 1e6,
+    FieldType.Boolean: True,
+    FieldType.Decimal: Decimal('1.25'),
+    FieldType.Date: date(2019, 11, 1),
+    FieldType.Timestamp: datetime(2019, 11, 1, 12, 30, 15, 250000),
+    FieldType.Json: {'legs': [1, 2]},
+}
+
+
+def bench_field_access():
+    print('{:<12}{:>14}{:>14}'.format('us/call', 'get', 'set'))
+    for field_type in DEFAULT_CONVERTER:
+        mapper = MapperBase.create_type_from(value=Field(type_=field_type))
+        instance = mapper(value=SAMPLE_VALUES[field_type])
+        value = instance.value
+
+        def get():
+            return instance.value
+
+        def set_():
+            instance.value = value
+
+        print('{:<12}{:>14.3f}{:>14.3f}'.format(field_type.name, best_of(get), best_of(set_)))
+
+
+def bench_batch(sizes=(10000, 100000, 1000000)):
+    print('{:<12}{:>14}{:>14}{:>14}{:>14}'.format('records/s', 'build_from', 'build_many',
+                                                 'generate', 'generate_many'))
+    for size in sizes:
+        rows = [Compiled(**VALUES).generate() for _ in range(size)]
+        instances = Compiled.build_many(rows)
+        timings = []
+        for func in (lambda: [Compiled.build_from(row) for row in rows],
+                     lambda: Compiled.build_many(rows),
+                     lambda: [instance.generate() for instance in instances],
+                     lambda: Compiled.generate_many(instances)):
+            start = perf_counter()
+            func()
+            timings.append(size / (perf_counter() - start))
+        print('{:<12}{:>14,.0f}{:>14,.0f}{:>14,.0f}{:>14,.0f}'.format(size, *timings))
+
+
+def bytes_per_instance(factory, count=100000):
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    instances = [factory() for _ in range(count)]
+    size = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    del instances
+    return size / count
+
+
+def bench_memory():
+    # includes the converted field values, the same for both storages
+    print('{:<12}{:>14}'.format('bytes', 'per instance'))
+    for cls in (Compiled, Compact):
+        print('{:<12}{:>14.1f}'.format(cls.__name__, bytes_per_instance(lambda: cls(**VALUES))))
+
+
+class Book(MapperBase):
+    trades = ListField(Compiled)
+
+
+def bench_list_iteration(size=100000, passes=3):
+    book = Book.build_from({'trades': [Compiled(**VALUES).generate() for _ in range(size)]})
+    print('{:<12}{:>14}'.format('pass', 's/iteration'))
+    for index in range(passes):
+        start = perf_counter()
+        for trade in book.trades:
+            trade.name
+        print('{:<12}{:>14.3f}'.format(index + 1, perf_counter() - start))
+
+
+def bench_converters():
+    def strptime_date(value):
+        return date(*strptime(value, '%Y-%m-%d')[:3])
+
+    def strptime_datetime(value):
+        return datetime.strptime(value, '%Y-%m-%dT%H:%M:%S.%fZ')
+
+    print('{:<12}{:>14}{:>14}{:>14}'.format('us/call', 'strptime', 'fast path', 'cached'))
+    timing = best_of(lambda: strptime_date('2019-11-01')), best_of(lambda: convert_to_python_date('2019-11-01'))
+    cache_dates()
+    cached = best_of(lambda: convert_to_python_date('2019-11-01'))
+    cache_dates(0)
+    print('{:<12}{:>14.3f}{:>14.3f}{:>14.3f}'.format('Date', *timing, cached))
+    value = '2019-11-01T12:30:15.250Z'
+    print('{:<12}{:>14.3f}{:>14.3f}'.format('Timestamp', best_of(lambda: strptime_datetime(value)),
+                                            best_of(lambda: convert_to_python_datetime(value))))
+
+
+if __name__ == '__main__':
+    bench_codec()
+    print()
+    bench_field_access()
+    print()
+    bench_batch()
+    print()
+    bench_memory()
+    print()
+    bench_list_iteration()
+    print()
+    bench_converters()
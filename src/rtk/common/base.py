@@ -1,8 +1,77 @@
-from .meta import MetaMapper, IConverter
+from collections import OrderedDict, namedtuple
+from operator import attrgetter, methodcaller
+
+from .jsonl import DEFAULT_CHUNK_SIZE, JsonLinesReader
+from .meta import Field, MetaMapper, IConverter, specialisable
+
+TypeCacheInfo = namedtuple('TypeCacheInfo', 'hits misses maxsize currsize')
+
+
+class TypeCache:
+    """
+    Bounded LRU cache of the types created by MapperBase.create_type_from, keyed by the structure of their fields
+    """
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._types = OrderedDict()
+
+    @staticmethod
+    def key(base, fields):
+        """
+        structural key of the type, None if some field cannot be described
+        :param base: base class of the type
+        :param fields: attr name -> Field
+        :return: hashable key or None
+        """
+        key = (base, tuple((attr_name, field.structure() if isinstance(field, Field) else field)
+                           for attr_name, field in fields.items()))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def get(self, key, factory):
+        """
+        cached type of key, created by factory on a miss
+        :param key: structural key, None to bypass the cache
+        :param factory: callable creating the type
+        :return: type
+        """
+        if key is not None and key in self._types:
+            self.hits += 1
+            self._types.move_to_end(key)
+            return self._types[key]
+
+        self.misses += 1
+        type_ = factory()
+        if key is not None and self.maxsize:
+            self._types[key] = type_
+            while len(self._types) > self.maxsize:
+                self._types.popitem(last=False)
+        return type_
+
+    def info(self):
+        return TypeCacheInfo(self.hits, self.misses, self.maxsize, len(self._types))
+
+    def clear(self):
+        self.hits = self.misses = 0
+        self._types.clear()
+
+
+type_cache = TypeCache()
 
 
 class MapperBase(IConverter, metaclass=MetaMapper):
+    # no __dict__, for compact subclasses to carry none; _data is a slot so that MapperBase itself can be
+    # instantiated, unused by compact instances. _field_cache holds the values cached by fields (ListField proxies,
+    # JsonField documents), left out of vars() and of the pickled state
+    __slots__ = ('_data', '_field_cache')
+    _codec = True
 
+    @specialisable
     def __init__(self, **values):
         self._data = {}
         for attr_name, field in self._fields.items():
@@ -11,6 +80,13 @@ class MapperBase(IConverter, metaclass=MetaMapper):
             else:
                 setattr(self, attr_name, getattr(self, attr_name))
 
+    def __getstate__(self):
+        for field in self._flushed_fields:  # the documents modified in place are pickled encoded
+            field.flush(self)
+        slots = {name: getattr(self, name) for klass in type(self).__mro__
+                 for name in klass.__dict__.get('__slots__', ()) if name != '_field_cache' and hasattr(self, name)}
+        return getattr(self, '__dict__', None), slots
+
     def __repr__(self):
         return '<{}: {}>'.format(self.__class__.__name__, self._data)
 
@@ -36,24 +112,73 @@ class MapperBase(IConverter, metaclass=MetaMapper):
         return self._data.setdefault(name, default)
 
     def generate(self):
+        for field in self._flushed_fields:
+            field.flush(self)
         return self._data
 
     @classmethod
     def create_type_from(cls, **d):
-        fields = {}
+        """
+        create an anonymous mapper type from fields, the same type being returned for the same fields
+        see type_cache for the cache statistics and size
+        :param d: attr name -> Field
+        :return: subclass of cls
+        """
+        # name the fields first, for the key of fields already named by a previous call to match
         for attr_name, attr_val in d.items():
             if not attr_val.name:
                 attr_val.name = attr_name
-            fields[attr_name] = attr_val
-        d['_fields'] = fields
+        return type_cache.get(TypeCache.key(cls, d), lambda: cls._create_type(d))
+
+    @classmethod
+    def _create_type(cls, d):
+        d['_fields'] = dict(d)
         return type('AnonymousSAType', (cls,), d)
 
     @classmethod
+    @specialisable
     def build_from(cls, data):
         instance = cls()
         instance._data = data
         return instance
 
+    @classmethod
+    def build_many(cls, iterable, lazy=False):
+        """
+        build instances from a batch of dicts
+        :param iterable: dicts
+        :param lazy: return an iterator instead of a list, to keep memory flat
+        :return: list (or iterator) of instances
+        """
+        instances = map(cls.build_from, iterable)
+        return instances if lazy else list(instances)
+
+    @classmethod
+    def generate_many(cls, instances, lazy=False):
+        """
+        generate dicts from a batch of instances
+        :param instances: instances of cls
+        :param lazy: return an iterator instead of a list, to keep memory flat
+        :return: list (or iterator) of dicts
+        """
+        if cls.generate is MapperBase.generate and not cls._flushed_fields:
+            data = map(attrgetter('_data'), instances)
+        else:
+            data = map(methodcaller('generate'), instances)
+        return data if lazy else list(data)
+
+    @classmethod
+    def iter_jsonl(cls, path_or_file, chunk_size=DEFAULT_CHUNK_SIZE, batch_size=None):
+        """
+        stream instances from a JSON lines file, in bounded memory
+        lines with invalid field values are skipped and counted on the returned reader
+        :param path_or_file: file path, or file object
+        :param chunk_size: number of bytes read at once
+        :param batch_size: yield columnar RecordBatch of batch_size records instead of instances
+        :return: JsonLinesReader, iterable of instances (or batches)
+        """
+        return JsonLinesReader(cls, path_or_file, chunk_size, batch_size)
+
     def _to_python(self, value):
         return self.build_from(value)
 
@@ -62,4 +187,3 @@ class MapperBase(IConverter, metaclass=MetaMapper):
 
     def items(self):
         return self._data.items()
-
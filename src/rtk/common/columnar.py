@@ -0,0 +1,380 @@
+r"""
+Columnar (struct-of-arrays) storage of records of one mapper type
+
+Integer, Float, Boolean and Date fields with the default converters are held in typed arrays:
+NumPy arrays if NumPy is installed, else arrays of the array module. Other fields, and the typed ones
+holding missing values (or Boolean values other than the bools True and False, e.g. the 'True'/'False' str
+generated by the Boolean converter), are held as lists of the raw (dict side) values, read through the field
+converters like mapper instances read them.
+"""
+from array import array
+from datetime import date, datetime
+
+from .meta import DEFAULT_CONVERTER, FieldType
+
+try:
+    import numpy as np
+except ImportError:  # fall back to the array module
+    np = None
+
+__all__ = ['RecordBatch',
+           'RecordView']
+
+EPOCH = date(1970, 1, 1).toordinal()
+
+ISO_DATE_FORMAT = '%Y-%m-%d'
+
+# FieldType -> (numpy dtype, array typecode), dates in array are days since epoch
+COLUMN_TYPES = {
+    FieldType.Integer: ('int64', 'q'),
+    FieldType.Float: ('float64', 'd'),
+    FieldType.Boolean: ('bool', 'b'),
+    FieldType.Date: ('datetime64[D]', 'i'),
+}
+
+
+def column_type(field):
+    """
+    FieldType of the typed array holding the field, None for a list of raw values
+    """
+    if field.type in COLUMN_TYPES and field._to_python is DEFAULT_CONVERTER[field.type].topython:
+        return field.type
+    return None
+
+
+def _to_array(field_type, field, values):
+    dtype, typecode = COLUMN_TYPES[field_type]
+    if np is not None:
+        return np.array(values, dtype=dtype)
+    if field_type is FieldType.Date:
+        return array(typecode, [field._to_python(value).toordinal() - EPOCH for value in values])
+    return array(typecode, map(field._to_python, values))
+
+
+def _to_python_list(field_type, column):
+    if np is not None:
+        return column.tolist()
+    if field_type is FieldType.Boolean:
+        return list(map(bool, column))
+    if field_type is FieldType.Date:
+        return [date.fromordinal(value + EPOCH) for value in column]
+    return column.tolist()
+
+
+def _to_python_item(field_type, column, index):
+    value = column[index]
+    if np is not None:
+        return value.item()
+    if field_type is FieldType.Boolean:
+        return bool(value)
+    if field_type is FieldType.Date:
+        return date.fromordinal(value + EPOCH)
+    return value
+
+
+class RecordBatch:
+    """
+    Records of one mapper type, stored as one column per field
+    Columns are keyed by attribute name like the mapper fields, dicts by field name like generate()
+    """
+    def __init__(self, mapper, columns, types, length):
+        """
+        use from_dicts() / from_instances() instead
+        :param mapper: MapperBase subclass
+        :param columns: attr name -> typed array or list of raw values
+        :param types: attr name -> FieldType of typed arrays, None for lists
+        :param length: number of records
+        """
+        self.mapper = mapper
+        self.columns = columns
+        self.types = types
+        self._length = length
+        self._names = {mapper._fields[attr_name].name: attr_name for attr_name in columns}
+
+    @classmethod
+    def from_dicts(cls, mapper, rows):
+        """
+        load records from dicts, as generated by the mapper
+        :param mapper: MapperBase subclass
+        :param rows: sequence of dicts
+        :return: RecordBatch
+        """
+        if not isinstance(rows, (list, tuple)):
+            rows = list(rows)
+        columns = {}
+        types = {}
+        for attr_name, field in mapper._fields.items():
+            values = [row.get(field.name) for row in rows]
+            field_type = column_type(field)
+            if field_type is not None and None in values:
+                field_type = None
+            if field_type is FieldType.Boolean and not all(type(value) is bool for value in values):
+                field_type = None  # bool() reads 'False' as True: only bools read as they are
+            if field_type is not None:
+                try:
+                    values = _to_array(field_type, field, values)
+                except (ValueError, TypeError, OverflowError):  # e.g. 'abc' or an int beyond int64
+                    field_type = None
+            columns[attr_name] = values
+            types[attr_name] = field_type
+        return cls(mapper, columns, types, len(rows))
+
+    @classmethod
+    def from_instances(cls, mapper, instances):
+        """
+        load records from mapper instances
+        :param mapper: MapperBase subclass
+        :param instances: instances of mapper
+        :return: RecordBatch
+        """
+        return cls.from_dicts(mapper, mapper.generate_many(instances))
+
+    def column(self, attr_name):
+        """typed array or list of raw values of the field"""
+        return self.columns[attr_name]
+
+    def values(self, attr_name):
+        """python values of the field, as read on mapper instances"""
+        field_type = self.types[attr_name]
+        column = self.columns[attr_name]
+        if field_type is not None:
+            return _to_python_list(field_type, column)
+        field = self.mapper._fields[attr_name]
+        return [field.__get__(_Raw(field.name, value), self.mapper) for value in column]
+
+    def raw_values(self, attr_name):
+        """raw (dict side) values of the field, as generated by mapper instances"""
+        field_type = self.types[attr_name]
+        column = self.columns[attr_name]
+        if field_type is None:
+            return list(column)
+        field = self.mapper._fields[attr_name]
+        default = field._from_python is DEFAULT_CONVERTER[field_type].frompython
+        if default and np is not None and field_type is FieldType.Date:
+            # the same dates repeat: format each distinct date once
+            days, positions = np.unique(column, return_inverse=True)
+            return np.datetime_as_string(days, unit='D')[positions].tolist()
+        values = _to_python_list(field_type, column)
+        if field_type is FieldType.Boolean or default and field_type is FieldType.Integer:
+            return values  # raw values are the python ones
+        return list(map(field._from_python, values))
+
+    def to_dicts(self):
+        """
+        the records as dicts, as generated by the mapper
+        :return: list of dicts
+        """
+        names = [self.mapper._fields[attr_name].name for attr_name in self.columns]
+        columns = [self.raw_values(attr_name) for attr_name in self.columns]
+        if not columns:
+            return [{} for _ in range(self._length)]
+        return [dict(zip(names, values)) for values in zip(*columns)]
+
+    def select(self, *attr_names):
+        """
+        project the batch on some fields, sharing the columns
+        :param attr_names: attribute names of the fields to keep
+        :return: RecordBatch
+        """
+        return RecordBatch(self.mapper,
+                           {attr_name: self.columns[attr_name] for attr_name in attr_names},
+                           {attr_name: self.types[attr_name] for attr_name in attr_names},
+                           self._length)
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        for index in range(self._length):
+            yield RecordView(self, index)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._length)
+            columns = {attr_name: column[index] for attr_name, column in self.columns.items()}
+            return RecordBatch(self.mapper, columns, dict(self.types), len(range(start, stop, step)))
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('RecordBatch index out of range')
+        return RecordView(self, index)
+
+    def __repr__(self):
+        return '<{} of {}: {} records, columns {}>'.format(self.__class__.__name__, self.mapper.__name__,
+                                                           self._length, list(self.columns))
+
+    def _python_value(self, attr_name, index):
+        field_type = self.types[attr_name]
+        column = self.columns[attr_name]
+        if field_type is not None:
+            return _to_python_item(field_type, column, index)
+        field = self.mapper._fields[attr_name]
+        return field.__get__(_Raw(field.name, column[index]), self.mapper)
+
+    def _raw_value(self, attr_name, index):
+        field_type = self.types[attr_name]
+        column = self.columns[attr_name]
+        if field_type is None:
+            return column[index]
+        value = _to_python_item(field_type, column, index)
+        if field_type is FieldType.Boolean:
+            return value  # raw values are the python ones
+        return self.mapper._fields[attr_name]._from_python(value)
+
+
+class _Raw:
+    """Minimal holder to read a raw value through Field.__get__, applying the converter and default"""
+    __slots__ = ('_data',)
+
+    def __init__(self, name, value):
+        self._data = {name: value}
+
+
+class RecordView:
+    """
+    One record of a RecordBatch, reading like an instance of the mapper without materialising it
+    """
+    __slots__ = ('_batch', '_index')
+
+    def __init__(self, batch, index):
+        self._batch = batch
+        self._index = index
+
+    def __getattr__(self, attr_name):
+        if attr_name not in self._batch.columns:
+            raise AttributeError('{} has no field {}'.format(self._batch.mapper.__name__, attr_name))
+        return self._batch._python_value(attr_name, self._index)
+
+    def __repr__(self):
+        return '<{}: {}>'.format(self._batch.mapper.__name__, self.generate())
+
+    def __iter__(self):
+        return iter(self._batch._names)
+
+    def __len__(self):
+        return len(self._batch._names)
+
+    def __getitem__(self, name):
+        return self._batch._raw_value(self._batch._names[name], self._index)
+
+    def get(self, name, default=None):
+        return self[name] if name in self._batch._names else default
+
+    def generate(self):
+        return {name: self._batch._raw_value(attr_name, self._index)
+                for name, attr_name in self._batch._names.items()}
+
+    def items(self):
+        return self.generate().items()
+
+    def materialise(self):
+        """the record as an instance of the mapper"""
+        return self._batch.mapper.build_from(self.generate())
+
+
+def _date_parser(date_format):
+    """str -> days since epoch"""
+    if date_format == ISO_DATE_FORMAT:
+        return lambda value: date.fromisoformat(value).toordinal() - EPOCH
+    return lambda value: datetime.strptime(value, date_format).toordinal() - EPOCH
+
+
+def _convert_chunk(field_type, values, date_format):
+    """
+    typed array of the str values, raising ValueError if one does not convert (OverflowError if an integer does not
+    fit in int64)
+    """
+    dtype, typecode = COLUMN_TYPES[field_type]
+    if field_type is FieldType.Float:
+        values = [value or 'nan' for value in values]
+    elif field_type is FieldType.Boolean:
+        invalid = set(values) - {'True', 'False'}
+        if invalid:
+            raise ValueError('not a boolean: {!r}'.format(invalid.pop()))
+        values = [value == 'True' for value in values]
+    elif field_type is FieldType.Date:
+        parse = _date_parser(date_format)
+        days = {value: parse(value) for value in set(values)}  # the same dates repeat
+        values = [days[value] for value in values]
+        if np is not None:
+            return np.array(values, dtype='int64').astype(dtype)
+        return array(typecode, values)
+    elif field_type is FieldType.Integer:
+        values = list(map(int, values))
+    if np is not None:
+        return np.array(values, dtype=dtype)
+    return array(typecode, map(float, values) if field_type is FieldType.Float else values)
+
+
+def _infer(values, date_format):
+    """FieldType of the typed array able to hold the str values, None for a list of str"""
+    if not values or '' in values:
+        return None
+    for field_type in (FieldType.Integer, FieldType.Float, FieldType.Boolean, FieldType.Date):
+        try:
+            _convert_chunk(field_type, values, date_format)
+            return field_type
+        except ValueError:
+            pass
+        except OverflowError:  # integers beyond int64, kept as str rather than rounded to floats
+            return None
+    return None
+
+
+class ColumnBuilder:
+    """
+    Build one column from chunks of str values, in a typed array for the Integer, Float, Boolean and Date types
+    (empty Float values being NaN), else in a list of values converted like Field
+    """
+    def __init__(self, name, field_type=None, infer=False, date_format=ISO_DATE_FORMAT):
+        """
+        :param name: column name
+        :param field_type: FieldType, None to infer it or keep str values
+        :param infer: whether to infer the type from the first chunk, Integer, Float, Boolean, Date or str, falling
+            back to str if a later chunk does not convert
+        :param date_format: strptime format of the dates
+        """
+        self.name = name
+        self.field_type = field_type
+        self.infer = infer and field_type is None
+        self.date_format = date_format
+        self._chunks = []
+        self._raw_chunks = []  # the str values of the typed chunks while the inferred type may still be demoted
+
+    def append(self, values):
+        """
+        :param values: sequence of str
+        """
+        if self.infer and not self._chunks:
+            self.field_type = _infer(values, self.date_format)
+        if self.field_type not in COLUMN_TYPES:
+            convert = DEFAULT_CONVERTER[self.field_type].topython if self.field_type else None
+            self._chunks.append(list(values) if convert is None else [convert(value) for value in values])
+            return
+        try:
+            self._chunks.append(_convert_chunk(self.field_type, values, self.date_format))
+        except (ValueError, OverflowError) as error:
+            if not self.infer:
+                raise ValueError('column {}: {}'.format(self.name, error)) from error
+            self._demote()
+            self._chunks.append(list(values))
+            return
+        if self.infer:
+            self._raw_chunks.append(list(values))
+
+    def _demote(self):
+        """hold the typed chunks as the str values read"""
+        self.field_type = None
+        self._chunks, self._raw_chunks = self._raw_chunks, []
+
+    def column(self):
+        """typed array, or list"""
+        if self.field_type in COLUMN_TYPES:
+            if np is not None:
+                return np.concatenate(self._chunks) if self._chunks else np.array([], COLUMN_TYPES[
+                    self.field_type][0])
+            column = array(COLUMN_TYPES[self.field_type][1])
+            for chunk in self._chunks:
+                column.extend(chunk)
+            return column
+        return [value for chunk in self._chunks for value in chunk]
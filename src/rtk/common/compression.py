@@ -0,0 +1,147 @@
+r"""
+Transparent reading and writing of compressed files
+
+gzip, bz2 and xz are supported with the standard library, zstd if the zstandard package is installed.
+Files read are recognised by their magic bytes, files written by their extension. Reading decompresses in a
+background thread, so that decompression overlaps with parsing.
+"""
+import bz2
+import gzip
+import io
+import locale
+import lzma
+import os
+import queue
+import threading
+from collections import namedtuple
+
+try:
+    import zstandard
+except ImportError:  # zstd files are not supported
+    zstandard = None
+
+__all__ = ['open_file',
+           'compression_of']
+
+Compression = namedtuple('Compression', 'name magic extensions open')
+
+COMPRESSIONS = (
+    Compression('gzip', b'\x1f\x8b', ('.gz', '.gzip'), gzip.open),
+    Compression('bz2', b'BZh', ('.bz2',), bz2.open),
+    Compression('xz', b'\xfd7zXZ\x00', ('.xz', '.lzma'), lzma.open),
+    Compression('zstd', b'\x28\xb5\x2f\xfd', ('.zst', '.zstd'), zstandard.open if zstandard else None),
+)
+
+MAGIC_LENGTH = max(len(compression.magic) for compression in COMPRESSIONS)
+
+# size of the decompressed blocks handed over by the background thread, and number of blocks buffered
+DEFAULT_BLOCK_SIZE = 1 << 20
+DEFAULT_BUFFER_BLOCKS = 8
+
+
+def compression_of(path, mode='r'):
+    """
+    :param path: file path
+    :param mode: open mode, the compression of files read is given by their magic bytes, else by their extension
+    :return: Compression, None if not compressed
+    """
+    if mode[0] == 'r':
+        with open(path, 'rb') as file:
+            magic = file.read(MAGIC_LENGTH)
+        compression = next((compression for compression in COMPRESSIONS if magic.startswith(compression.magic)),
+                           None)
+    else:
+        extension = os.path.splitext(os.fspath(path))[1].lower()
+        compression = next((compression for compression in COMPRESSIONS if extension in compression.extensions),
+                           None)
+    if compression and compression.open is None:
+        raise ValueError('{}: {} files need the zstandard package'.format(path, compression.name))
+    return compression
+
+
+def open_file(path, mode='r', compression=None):
+    """
+    open() decompressing or compressing the file if need be
+    :param path: file path
+    :param mode: 'r', 'w', 'a' (text) or 'rb', 'wb', 'ab'
+    :param compression: Compression, by default compression_of(path, mode)
+    :return: file object
+    """
+    compression = compression or compression_of(path, mode)
+    if compression is None:
+        return open(path, mode)
+    binary = 'b' in mode
+    if mode[0] != 'r':
+        return compression.open(path, mode if binary else mode + 't')
+
+    stream = io.BufferedReader(ThreadedReader(compression.open(path, 'rb')), DEFAULT_BLOCK_SIZE)
+    return stream if binary else io.TextIOWrapper(stream, encoding=locale.getpreferredencoding(False))
+
+
+_END = b''
+
+
+class ThreadedReader(io.RawIOBase):
+    """
+    Raw binary stream reading another one in a background thread, through a bounded queue of blocks
+    """
+    def __init__(self, file, block_size=DEFAULT_BLOCK_SIZE, buffer_blocks=DEFAULT_BUFFER_BLOCKS):
+        """
+        :param file: binary file object, closed with this stream
+        :param block_size: number of bytes read at once
+        :param buffer_blocks: maximum number of blocks read ahead
+        """
+        super().__init__()
+        self._file = file
+        self._block_size = block_size
+        self._blocks = queue.Queue(buffer_blocks)
+        self._block = memoryview(b'')
+        self._eof = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._read_ahead, name='threaded-reader', daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._blocks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _read_ahead(self):
+        try:
+            while True:
+                block = self._file.read(self._block_size)
+                if not self._put(block) or block == _END:
+                    return
+        except BaseException as error:
+            self._put(error)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._block:
+            if self._eof:
+                return 0
+            block = self._blocks.get()
+            if isinstance(block, BaseException):
+                self._eof = True
+                raise block
+            if block == _END:
+                self._eof = True
+                return 0
+            self._block = memoryview(block)
+        size = min(len(buffer), len(self._block))
+        buffer[:size] = self._block[:size]
+        self._block = self._block[size:]
+        return size
+
+    def close(self):
+        if not self.closed:
+            self._stop.set()
+            self._thread.join()
+            self._file.close()
+        super().close()
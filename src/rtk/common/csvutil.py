@@ -1,44 +1,621 @@
+import copy
 import csv
+import io
+import json
+import locale
 import logging
+import mmap
+import os
+import re
 from abc import ABC, abstractmethod
+from bisect import bisect_right
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice, zip_longest
 
 from contextlib import ExitStack
 
+from .columnar import ISO_DATE_FORMAT, ColumnBuilder
+from .compression import compression_of, open_file
 from .log import with_logger
+from .pipeline import group_sections
 
 _logger = logging.getLogger(__name__)
 
+# byte range [start, end) of the file processed by one worker, header_start being the offset of the
+# header line in effect at start when the chunk starts inside a section, else None
+CsvChunk = namedtuple('CsvChunk', 'header_start start end')
 
-def process_csv(input_file_path, *, output_file_path=None, record_parser=None, multiple_header=False):
-    with open(input_file_path) as input_file:
+# a line whose first column is not empty: a header
+HEADER_LINE_PATTERN = re.compile(rb'(?:^|\n)([^,\r\n])')
+
+# header and byte range [start, end) of a section of a csv file, see build_section_index
+CsvSection = namedtuple('CsvSection', 'header start end')
+
+# suffix of the sidecar file holding the section index of a csv file
+SECTION_INDEX_SUFFIX = '.sections.json'
+
+# header and columns (name -> typed array or list) of a section, see load_sections
+SectionColumns = namedtuple('SectionColumns', 'header columns')
+
+# number of rows parsed at once by load_sections
+DEFAULT_CHUNK_ROWS = 8192
+
+# encoding of the files read and written as bytes, the one open() uses for text
+ENCODING = locale.getpreferredencoding(False)
+
+
+def process_csv(input_file_path, *, output_file_path=None, record_parser=None, multiple_header=False,
+                workers=None, columns=None, sections=None):
+    """
+    Read the csv file, feed the records to record_parser section by section and write them out
+    :param input_file_path: csv file, made of sections of a header (row with a non empty first column) and records
+    :param output_file_path: file to write the records to, after record_parser processed them
+    :param record_parser: RecordParserBase
+    :param multiple_header: whether the file can have more than one section
+    :param workers: number of processes to parse chunks of the file in parallel, see process_csv_parallel
+    :param columns: names of the only columns record_parser reads, the others being left as None in the records,
+        by default record_parser.columns.
+        With columns or a record_parser.predicate, the file is scanned as bytes from a memory map: only these
+        columns of the records passing the predicate are decoded, and the lines record_parser skips or leaves
+        unchanged are written out as they were read. Records must not span lines
+    The input can be compressed with gzip, bz2, xz or zstd (see compression), and is then decompressed in a
+    background thread; the output is compressed according to its extension
+    :param sections: positions or names (first column of the header) of the only sections to read and write out,
+        found with the section index of the file (see section_index) and processed serially. A compressed file
+        has no index: it is read twice, once for its headers and once filtering the sections
+    :return: None
+    """
+    if sections is not None:
+        if compression_of(input_file_path):
+            _process_compressed_sections(input_file_path, sections, output_file_path, record_parser,
+                                         multiple_header, columns)
+        else:
+            _process_sections(input_file_path, _select_sections(input_file_path, sections, section_index),
+                              output_file_path, record_parser, multiple_header, columns)
+        return
+
+    if workers and workers > 1:
+        process_csv_parallel(input_file_path, workers, output_file_path=output_file_path,
+                             record_parser=record_parser, multiple_header=multiple_header, columns=columns)
+        return
+
+    raw, columns = _raw_columns(record_parser, columns)
+    if raw:
+        with ExitStack() as stack:
+            lines = _input_lines(input_file_path, stack)
+            output_file = stack.enter_context(open_file(output_file_path, 'wb')) if output_file_path else None
+            _process_lines(lines, output_file, record_parser, multiple_header, columns)
+        return
+
+    with open_file(input_file_path) as input_file:
         _reader = csv.reader(input_file)
 
         _writer = None
         with ExitStack() as stack:
             if output_file_path:
-                _output_file = stack.enter_context(open(output_file_path, 'w'))
+                _output_file = stack.enter_context(open_file(output_file_path, 'w'))
                 _writer = csv.writer(_output_file, lineterminator='\n')
 
-            _header = []
-            for row in _reader:
-                if record_parser:
-                    if not multiple_header:
-                        assert not (_header and row[0])
-                    if row[0]:
-                        record_parser.section_done()
-                        record_parser.header = _header = row
-                    else:
-                        record_parser(row)
+            _process_rows(_reader, _writer, record_parser, multiple_header)
+
+
+def iter_sections(input_file_path):
+    """
+    Read the csv file lazily, section by section, see pipeline for the stages processing them
+    :param input_file_path: csv file, made of sections of a header (row with a non empty first column) and records
+    :return: generator of pipeline.Section(header, rows), rows being an iterator over the records of the section,
+        valid until the next section
+    """
+    with open_file(input_file_path) as input_file:
+        yield from group_sections(csv.reader(input_file), lambda row: row if row and row[0] else None)
+
+
+def load_sections(input_file_path, schema=None, *, infer=False, date_format=ISO_DATE_FORMAT,
+                  chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Load the csv file section by section into columns, typed arrays (NumPy if installed, else array) for the
+    Integer, Float, Boolean and Date columns, see columnar.ColumnBuilder. The rows are parsed in chunks of
+    chunk_rows, so that no more than one chunk of rows is held at once
+    :param input_file_path: csv file, made of sections of a header (row with a non empty first column) and records,
+        possibly compressed
+    :param schema: column name -> FieldType, the other columns being inferred or loaded as str
+    :param infer: whether to infer the types of the columns missing from schema
+    :param date_format: strptime format of the dates
+    :param chunk_rows: number of rows parsed at once
+    :return: generator of SectionColumns(header, columns), columns mapping the names of the header but the first
+        one (the section name, empty in the records) to the columns
+    """
+    schema = schema or {}
+    for header, rows in iter_sections(input_file_path):
+        builders = [ColumnBuilder(name, schema.get(name), infer, date_format) for name in header[1:]]
+        while True:
+            rows_chunk = list(islice(rows, chunk_rows))
+            if not rows_chunk:
+                break
+            columns = list(islice(zip_longest(*rows_chunk, fillvalue=''), 1, len(builders) + 1))
+            columns.extend([('',) * len(rows_chunk)] * (len(builders) - len(columns)))  # missing in short rows
+            for builder, values in zip(builders, columns):
+                builder.append(values)
+        yield SectionColumns(header, {builder.name: builder.column() for builder in builders})
+
+
+def _process_sections(input_file_path, sections, output_file_path, record_parser, multiple_header, columns):
+    """process_csv on the byte ranges of the sections only"""
+    raw, columns = _raw_columns(record_parser, columns)
+    with ExitStack() as stack:
+        output_file = stack.enter_context(open_file(output_file_path, 'wb' if raw else 'w')) \
+            if output_file_path else None
+        for section in sections:
+            output, _ = _process_chunk(input_file_path, CsvChunk(None, section.start, section.end), record_parser,
+                                       multiple_header, output_file is not None, raw, columns)
+            if output_file:
+                output_file.write(output)
+
+
+def _process_compressed_sections(input_file_path, selection, output_file_path, record_parser, multiple_header,
+                                 columns):
+    """process_csv on the selected sections of a compressed file, filtering them in a serial pass"""
+    positions = {section.start for section in _select_sections(input_file_path, selection, _compressed_sections)}
+    raw, columns = _raw_columns(record_parser, columns)
+    with ExitStack() as stack:
+        lines = _input_lines(input_file_path, stack)
+        output_file = stack.enter_context(open_file(output_file_path, 'wb' if raw else 'w')) \
+            if output_file_path else None
+        writer = csv.writer(output_file, lineterminator='\n') if output_file and not raw else None
+        sections = (section for section in group_sections(lines, lambda line: line if _is_header(line) else None)
+                    if section.header)  # not the lines before the first header
+        for position, (header, rows) in enumerate(sections):
+            if position not in positions:
+                continue
+            section_lines = chain([header], rows)
+            if raw:
+                _process_lines(section_lines, output_file, record_parser, multiple_header, columns)
+            else:
+                _process_rows(csv.reader(line.decode(ENCODING) for line in section_lines), writer, record_parser,
+                              multiple_header)
+
+
+def _process_rows(reader, writer, record_parser, multiple_header, header=None):
+    _header = header or []
+    for row in reader:
+        if record_parser:
+            if not multiple_header:
+                assert not (_header and row[0])
+            if row[0]:
+                record_parser.section_done()
+                record_parser.header = _header = row
+            else:
+                record_parser(row)
+
+        if writer:
+            writer.writerow(row)
+
+
+def _input_lines(input_file_path, stack):
+    """lines of the file as bytes, from a memory map unless the file is compressed"""
+    compression = compression_of(input_file_path)
+    input_file = stack.enter_context(open_file(input_file_path, 'rb', compression))
+    if compression:
+        return iter(input_file.readline, b'')
+    return _mapped_lines(input_file, stack)
+
 
-                if _writer:
-                    _writer.writerow(row)
+def _mapped_lines(input_file, stack):
+    """lines of the file as bytes, read from a memory map closed with stack"""
+    if not input_file.seek(0, io.SEEK_END):
+        return iter(())
+    data = stack.enter_context(mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ))
+    return iter(data.readline, b'')
+
+
+def _raw_columns(record_parser, columns):
+    """
+    :return: whether to process the file as bytes, and the projected columns (None for all)
+    """
+    if columns is None:
+        columns = getattr(record_parser, 'columns', None)
+    return columns is not None or getattr(record_parser, 'predicate', None) is not None, columns
+
+
+# per section: sorted indexes of the projected columns (None for all), number of columns,
+# index of the predicate column (None for no predicate) and its test
+SectionLayout = namedtuple('SectionLayout', 'projection width filter_index test')
+
+
+def _layout(header, columns, predicate):
+    lookup = RecordParserBase.build_column_lookup(header)
+    projection = None if columns is None else sorted(lookup[name] for name in columns if name in lookup)
+    filter_index = lookup.get(predicate.column) if predicate else None
+    return SectionLayout(projection, len(header), filter_index, predicate.test if predicate else None)
+
+
+def _process_lines(lines, output_file, record_parser, multiple_header, columns, header=None):
+    """_process_rows on lines as bytes, decoding only the projected columns of the records passing the predicate"""
+    predicate = getattr(record_parser, 'predicate', None)
+    decode_row = _row_decoder()
+    _header = header or []
+    layout = _layout(_header, columns, predicate)
+    for line in lines:
+        if record_parser and line.strip():
+            row = None
+            if line[:1] == b'"':  # the first column may be quoted empty
+                row = decode_row(line)
+                is_header = bool(row[0])
+            else:
+                is_header = line[:1] != b','
+            if is_header:
+                if not multiple_header:
+                    assert not _header
+                record_parser.section_done()
+                record_parser.header = _header = row or decode_row(line)
+                layout = _layout(_header, columns, predicate)
+            else:
+                line = _process_line(line, row, record_parser, layout, decode_row)
+
+        if output_file:
+            output_file.write(line)
+
+
+def _process_line(line, row, record_parser, layout, decode_row):
+    """
+    feed the record to record_parser, unless it fails the predicate
+    :param line: the record as bytes
+    :param row: the record already decoded, or None to decode the projected columns only
+    :param layout: SectionLayout
+    :param decode_row: see _row_decoder
+    :return: line if record_parser skipped or did not change the record, else the record encoded again
+    """
+    if layout.filter_index is not None:
+        value = _column(line, layout.filter_index) if row is None else None
+        if value is None:
+            row = row or decode_row(line)
+            value = row[layout.filter_index] if layout.filter_index < len(row) else None
+        if value is None or not layout.test(value):
+            return line
+
+    projected = row is None and layout.projection is not None
+    if projected:
+        row = _project(line, layout.projection, layout.width)
+        projected = row is not None
+    if row is None:
+        row = decode_row(line)
+
+    before = row.copy()
+    record_parser(row)
+    if row == before:
+        return line
+
+    spliced = _splice(line, before, row)
+    if spliced is not None:
+        return spliced
+    if projected:
+        # decode the columns left out, keeping the changed ones
+        changed = row
+        row = decode_row(line)
+        for index, value in enumerate(changed):
+            if index >= len(before) or value != before[index]:
+                row.extend([''] * (index + 1 - len(row)))
+                row[index] = value
+    # keep the line terminator read, e.g. '\r\n', like the lines left unchanged
+    body = line.rstrip(b'\r\n')
+    return _encode_row(row)[:-1] + line[len(body):]
+
+
+def _column(line, index):
+    """
+    decode one column of the record
+    :return: str, or None if the column is missing, quoted or follows a quote (decoding the record with the csv
+        module is then faster than skipping the quoted columns here)
+    """
+    quote = line.find(b'"')
+    parts = (line if quote == -1 else line[:quote]).split(b',', index + 1)
+    if index + 1 < len(parts) or quote == -1 and index < len(parts):
+        return parts[index].rstrip(b'\r\n').decode(ENCODING)
+    return None
+
+
+def _project(line, projection, width):
+    """
+    the record with only the projected columns decoded, the others being None
+    :return: list, or None if a projected column needs parsing the quotes
+    """
+    quote = line.find(b'"')
+    if quote == -1:
+        parts = line.rstrip(b'\r\n').split(b',')
+        known = width = len(parts)
+    else:  # the columns before the first quote are known
+        parts = line[:quote].split(b',')
+        known = len(parts) - 1
+        width = max(width, len(parts))
+    if projection and projection[-1] >= known:
+        return None
+    row = [None] * width
+    for index in projection:
+        row[index] = parts[index].decode(ENCODING)
+    return row
+
+
+def _splice(line, before, row):
+    """
+    the line with the columns record_parser changed encoded in place of the original ones, the others being kept
+    as read
+    :return: bytes, or None if a changed column was added or follows a quote, needing the record decoded
+    """
+    if len(row) != len(before):
+        return None
+    quote = line.find(b'"')
+    head = line.rstrip(b'\r\n') if quote == -1 else line[:quote]
+    parts = head.split(b',')
+    known = len(parts) if quote == -1 else len(parts) - 1
+    for index, value in enumerate(row):
+        if value != before[index]:
+            if index >= known:
+                return None
+            parts[index] = _encode_value(value)
+    return b','.join(parts) + line[len(head):]
+
+
+def _encode_value(value):
+    """one column encoded like csv.writer does"""
+    text = '' if value is None else str(value)
+    if ',' in text or '"' in text or '\r' in text or '\n' in text:
+        return _encode_row([text]).rstrip(b'\n')
+    return text.encode(ENCODING)
+
+
+def _row_decoder():
+    """
+    decode_row(line) -> list, decoding the lines with one csv reader fed a line at a time, faster than _decode_row
+    """
+    lines = []
+    reader = csv.reader(iter(lines.pop, None))
+
+    def decode_row(line):
+        lines.append(line.decode(ENCODING))
+        try:
+            return next(reader)
+        except IndexError:  # the line ends in a quoted column, the reader asking for the next line
+            return _decode_row(line)
+    return decode_row
+
+
+def _decode_row(line):
+    return next(csv.reader([line.decode(ENCODING)]))
+
+
+def _encode_row(row):
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator='\n').writerow(row)
+    return buffer.getvalue().encode(ENCODING)
+
+
+def _is_header(line):
+    """whether the line (bytes) is a header, like _header_offsets finds them"""
+    return line[:1] not in (b'', b',', b'\r', b'\n') and not line.startswith(b'"",')
+
+
+def _header_offsets(data):
+    """offsets of the header lines"""
+    return [match.start(1) for match in HEADER_LINE_PATTERN.finditer(data)
+            if data[match.start(1):match.start(1) + 3] != b'"",']  # quoted empty first column
+
+
+def _file_key(input_file_path):
+    stat = os.stat(input_file_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def build_section_index(input_file_path):
+    """
+    Scan the csv file for its sections and save them in the sidecar file input_file_path + SECTION_INDEX_SUFFIX,
+    keyed by the size and modification time of the file
+    Records spanning multiple lines (quoted line breaks) are not supported
+    :param input_file_path: csv file, not compressed (ValueError)
+    :return: list of CsvSection, in file order
+    """
+    if compression_of(input_file_path):
+        raise ValueError('{}: compressed files have no section index'.format(input_file_path))
+    key = _file_key(input_file_path)
+    with open(input_file_path, 'rb') as input_file, ExitStack() as stack:
+        if not key['size']:
+            return []
+        data = stack.enter_context(mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ))
+        headers = _header_offsets(data)
+        sections = [CsvSection(_decode_row(data[start:data.find(b'\n', start) + 1 or key['size']]), start, end)
+                    for start, end in zip(headers, headers[1:] + [key['size']])]
+
+    # written to a temporary file renamed over the index, so that readers never see a partial one
+    index_path = str(input_file_path) + SECTION_INDEX_SUFFIX
+    temp_path = '{}.{}.tmp'.format(index_path, os.getpid())
+    try:
+        with open(temp_path, 'w') as index_file:
+            json.dump(dict(key, sections=[section._asdict() for section in sections]), index_file)
+        os.replace(temp_path, index_path)
+    except OSError as error:
+        _logger.warning('cannot save the section index of %s: %s', input_file_path, error)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return sections
+
+
+def section_index(input_file_path):
+    """
+    the sections of the csv file, read from the sidecar file saved by build_section_index, built again if the csv
+    file changed since
+    :param input_file_path: csv file, not compressed
+    :return: list of CsvSection, in file order
+    """
+    try:
+        with open(str(input_file_path) + SECTION_INDEX_SUFFIX) as index_file:
+            index = json.load(index_file)
+    except (OSError, ValueError):
+        index = None
+    if not index or {'size': index.get('size'), 'mtime_ns': index.get('mtime_ns')} != _file_key(input_file_path):
+        return build_section_index(input_file_path)
+    return [CsvSection(**section) for section in index['sections']]
+
+
+def _compressed_sections(input_file_path):
+    """the sections of a compressed csv file, start being the position of the section instead of an offset"""
+    with ExitStack() as stack:
+        headers = (line for line in _input_lines(input_file_path, stack) if _is_header(line))
+        return [CsvSection(_decode_row(line), position, None) for position, line in enumerate(headers)]
+
+
+def _select_sections(input_file_path, selection, sections_of):
+    """
+    the sections of the file selected by position or name (first column of the header), in file order
+    :param sections_of: input_file_path -> list of CsvSection, e.g. section_index
+    """
+    index = sections_of(input_file_path)
+    selected = set()
+    for item in selection:
+        if isinstance(item, int):
+            if not -len(index) <= item < len(index):
+                raise ValueError('{}: no section {}, {} sections'.format(input_file_path, item, len(index)))
+            selected.add(item % len(index))
+        else:
+            positions = [position for position, section in enumerate(index) if section.header[0] == item]
+            if not positions:
+                raise ValueError('{}: no section {!r}'.format(input_file_path, item))
+            selected.update(positions)
+    return [index[position] for position in sorted(selected)]
+
+
+def plan_chunks(input_file_path, chunk_count):
+    """
+    Split the csv file into byte ranges at line boundaries, each knowing the header in effect at its start
+    Records spanning multiple lines (quoted line breaks) are not supported
+    :param input_file_path: csv file
+    :param chunk_count: number of chunks wanted
+    :return: list of CsvChunk, and the number of sections in the file
+    """
+    with open(input_file_path, 'rb') as input_file, ExitStack() as stack:
+        input_file.seek(0, io.SEEK_END)
+        size = input_file.tell()
+        if not size:
+            return [], 0
+        data = stack.enter_context(mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ))
+
+        headers = _header_offsets(data)
+        starts = {0}
+        for index in range(1, chunk_count):
+            line_end = data.find(b'\n', size * index // chunk_count)
+            if line_end != -1 and line_end + 1 < size:
+                starts.add(line_end + 1)
+
+    starts = sorted(starts)
+    chunks = []
+    for start, end in zip(starts, starts[1:] + [size]):
+        index = bisect_right(headers, start) - 1
+        header_start = headers[index] if index >= 0 and headers[index] != start else None
+        chunks.append(CsvChunk(header_start, start, end))
+    return chunks, len(headers)
+
+
+def process_csv_parallel(input_file_path, workers, *, output_file_path=None, record_parser=None,
+                         multiple_header=False, columns=None):
+    """
+    process_csv splitting the file into chunks parsed in a process pool, and writing them out in the original order
+    Each chunk is processed by a copy of record_parser, merged back into record_parser in file order,
+    see RecordParserBase.merge; section_done() is only called for the headers inside a chunk. A record_parser keeping
+    state (instance attributes) without overriding merge() is run serially instead, its state being otherwise lost
+    :param input_file_path: csv file, whose records do not span multiple lines, processed serially if compressed
+    :param workers: number of processes
+    :param output_file_path: file to write the records to
+    :param record_parser: RecordParserBase, picklable
+    :param multiple_header: whether the file can have more than one section
+    :param columns: names of the only columns record_parser reads, see process_csv
+    :return: None
+    """
+    if compression_of(input_file_path):
+        _logger.warning('%s is compressed and cannot be split into chunks, processing it serially', input_file_path)
+        process_csv(input_file_path, output_file_path=output_file_path, record_parser=record_parser,
+                    multiple_header=multiple_header, columns=columns)
+        return
+    if record_parser and _loses_state(record_parser):
+        _logger.warning('%s keeps state but does not override merge(), processing %s serially',
+                        type(record_parser).__name__, input_file_path)
+        process_csv(input_file_path, output_file_path=output_file_path, record_parser=record_parser,
+                    multiple_header=multiple_header, columns=columns)
+        return
+
+    raw, columns = _raw_columns(record_parser, columns)
+    chunks, sections = plan_chunks(input_file_path, workers * 4)
+    if record_parser and not multiple_header:
+        assert sections <= 1
+    # every chunk starts from the initial state of the parser, not from the merged one
+    template = copy.deepcopy(record_parser)
+
+    with ExitStack() as stack:
+        mode = 'wb' if raw else 'w'
+        output_file = stack.enter_context(open_file(output_file_path, mode)) if output_file_path else None
+        pool = stack.enter_context(ProcessPoolExecutor(workers))
+
+        # keep a bounded number of chunks in flight, so the output is written as it comes
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(_process_chunk, input_file_path, chunk, template, multiple_header,
+                                       output_file is not None, raw, columns))
+            if len(pending) >= workers * 2:
+                _collect(pending.popleft().result(), output_file, record_parser)
+        while pending:
+            _collect(pending.popleft().result(), output_file, record_parser)
+
+
+def _loses_state(record_parser):
+    """whether the state the copies of record_parser gather in the workers would be lost, merge() not merging it"""
+    stateful = any(name != 'col_lookup' for name in getattr(record_parser, '__dict__', ()))
+    return stateful and type(record_parser).merge is RecordParserBase.merge
+
+
+def _collect(result, output_file, record_parser):
+    text, chunk_parser = result
+    if output_file:
+        output_file.write(text)
+    if record_parser:
+        record_parser.merge(chunk_parser)
+
+
+def _process_chunk(input_file_path, chunk, record_parser, multiple_header, write, raw, columns):
+    """process one chunk in a worker, returning the output (text, or bytes if raw) and the parser copy"""
+    with open(input_file_path, 'rb') as input_file:
+        header = None
+        if chunk.header_start is not None:
+            input_file.seek(chunk.header_start)
+            header = _decode_row(input_file.readline())
+        input_file.seek(chunk.start)
+        data = input_file.read(chunk.end - chunk.start)
+
+    if record_parser and header:
+        record_parser.header = header
+    if raw:
+        output = io.BytesIO() if write else None
+        _process_lines(io.BytesIO(data), output, record_parser, multiple_header, columns, header)
+    else:
+        output = io.StringIO() if write else None
+        writer = csv.writer(output, lineterminator='\n') if write else None
+        _process_rows(csv.reader(io.TextIOWrapper(io.BytesIO(data))), writer, record_parser, multiple_header,
+                      header)
+    return output.getvalue() if write else None, record_parser
+
+
+# test on the value of one column, for RecordParserBase.predicate
+ColumnPredicate = namedtuple('ColumnPredicate', 'column test')
 
 
 @with_logger
 class RecordParserBase(ABC):
     """
     Base class of Record Parser
+    Subclasses can declare the only columns process_record reads (columns) and a cheap ColumnPredicate that records
+    must pass to be processed at all (predicate, records of sections without the column are all processed):
+    process_csv then decodes no more than that, see process_csv
     """
+    columns = None
+    predicate = None
+
     def __init__(self, **kwargs):
         self.__dict__.update(kwargs)
         self.col_lookup = None
@@ -59,6 +636,16 @@ class RecordParserBase(ABC):
         """
         pass
 
+    def merge(self, other):
+        """
+        merge the state of a copy which processed a chunk of the file in a worker process
+        (process_csv with workers), called in file order. Parsers with instance attributes that do not override it
+        are run serially
+        :param other: the copy
+        :return:
+        """
+        pass
+
     def __call__(self, record):
         self.process_record(record, self.col_lookup)
 
@@ -1,10 +1,30 @@
+import ast
+import operator
 import re
+from abc import ABC, abstractmethod
 from itertools import count
-from collections import namedtuple
+from collections import OrderedDict, defaultdict, namedtuple
+from functools import lru_cache
+from time import monotonic
+
+try:
+    import numpy as np
+except ImportError:  # batches are evaluated row by row
+    np = None
 
 
 CompiledVariable = namedtuple('CompiledVariable', 'config_var standard_var')
+# expression compiled once: source after constant folding, code object, variables, and the variables left after
+# folding (their resolvers are looked up by each Expression, as the registry may change)
+CompiledExpression = namedtuple('CompiledExpression', 'source code variables used')
+# results of Expression.evaluate_batch, path being VECTORISED or ROWS
+BatchResult = namedtuple('BatchResult', 'values path')
 DEFAULT_RESOLVER = 'default'
+VECTORISED = 'numpy'
+ROWS = 'rows'
+
+# number of distinct expression strings whose compiled form is kept
+INTERN_CACHE_SIZE = 1024
 
 
 def _resolve_variable(config_var: str, data_context: dict) -> str:
@@ -14,24 +34,25 @@ def _resolve_variable(config_var: str, data_context: dict) -> str:
 class Expression:
     """Python expression with user defined variables
     valid variable format: ${var} or ${var.attr}
-    complex variable needs the user to supply a variable resolver compliant to the default one '_resolve_variable'"""
+    complex variable needs the user to supply a variable resolver compliant to the default one '_resolve_variable'
+    The expression is compiled once, identical strings sharing the compiled form, and its constant sub-expressions
+    folded. Its variables are bound to the resolvers registered when it is created (see register_resolver).
+    The variables with a user resolver are resolved when first reached, at most once per evaluation"""
 
     VARIABLE_PATTERN = re.compile('\${[^\}]+\}')
     _resolver_registry = {DEFAULT_RESOLVER: _resolve_variable}
 
     def __init__(self, string: str):
         self._expression = string
-        self._var_idx = count(1)
-        self._variables = []
-        self._compiled = Expression.VARIABLE_PATTERN.sub(self._standardize_vars, string)
-
-    def _standardize_vars(self, match):
-        _variable = match.group()
-        assert isinstance(_variable, str) and len(_variable) > 3
-        _config_var = _variable[2:-1].strip()
-        _standard_var = ''.join(('__var_', str(next(self._var_idx))))
-        self._variables.append(CompiledVariable(_config_var, _standard_var))
-        return _standard_var
+        compiled = _compile(string)
+        self._compiled = compiled.source
+        self._variables = list(compiled.variables)
+        self._code = compiled.code
+        self._resolved = tuple((_var.standard_var, _var.config_var, Expression._get_var_resolver(_var.config_var))
+                               for _var in compiled.used)
+        self._lazy = any(_resolve_func is not _resolve_variable for _, _, _resolve_func in self._resolved)
+        self._resolvers = {_standard_var: (_config_var, _resolve_func)
+                           for _standard_var, _config_var, _resolve_func in self._resolved}
 
     @staticmethod
     def _get_var_resolver(var_name):
@@ -39,11 +60,445 @@ class Expression:
         ret = Expression._resolver_registry.get(_base_var)
         return ret or Expression._resolver_registry[DEFAULT_RESOLVER]
 
+    @staticmethod
+    def register_resolver(base_var, resolver):
+        """
+        resolve the variables ${base_var} and ${base_var.attr} of the expressions created from now on with resolver
+        :param base_var: variable name, DEFAULT_RESOLVER for the variables without a resolver
+        :param resolver: callable(config_var, data_context), see _resolve_variable, or BatchResolver
+        """
+        Expression._resolver_registry[base_var] = resolver
+
+    @staticmethod
+    def unregister_resolver(base_var):
+        """
+        resolve the variables ${base_var} and ${base_var.attr} of the expressions created from now on with the
+        default resolver again
+        :param base_var: variable name registered with register_resolver
+        """
+        if base_var == DEFAULT_RESOLVER:
+            raise ValueError('the default resolver cannot be unregistered, register another one instead')
+        del Expression._resolver_registry[base_var]
+
+    def _actual_values(self, data_context, known=None):
+        """
+        the values of the variables, as a mapping resolving them when first read if lazy
+        :param known: standard_var -> value of the variables already resolved
+        """
+        if self._lazy:
+            _values = _LazyValues(self._resolvers, data_context)
+            if known:
+                _values.update(known)
+            return _values
+        return {_standard_var: _resolve_func(_config_var, data_context)
+                for _standard_var, _config_var, _resolve_func in self._resolved}
+
+    def _resolve_batch(self, data_contexts):
+        """
+        resolve the variables of the BatchResolvers for all the data contexts, one call per resolver
+        :return: standard_var -> list of values, one per data context
+        """
+        _groups = defaultdict(list)
+        for _standard_var, _config_var, _resolve_func in self._resolved:
+            if isinstance(_resolve_func, BatchResolver):
+                _groups[_resolve_func].append((_standard_var, _config_var))
+        _resolved = {}
+        for _resolver, _variables in _groups.items():
+            _values = _resolver.resolve_batch([_config_var for _, _config_var in _variables], data_contexts)
+            _resolved.update((_standard_var, _values[_config_var]) for _standard_var, _config_var in _variables)
+        return _resolved
+
+    def evaluate_many(self, data_contexts, functions=None):
+        """
+        evaluate the expression for each data context, calling each BatchResolver once for all of them
+        (the variables it resolves are resolved for every data context, reached or not)
+        :param data_contexts: iterable of dicts, the keyword arguments of __call__
+        :param functions: globals of the expression, like __call__
+        :return: list of results
+        """
+        data_contexts = list(data_contexts)
+        _resolved = self._resolve_batch(data_contexts) if data_contexts else {}
+        _globals = functions or globals()
+        return [eval(self._code, _globals,
+                     self._actual_values(_data_context, {_standard_var: _values[_index]
+                                                         for _standard_var, _values in _resolved.items()}))
+                for _index, _data_context in enumerate(data_contexts)]
+
     def __call__(self, functions=None, **data_context):
-        _actual_values = {}
-        for _var in self._variables:
-            _resolve_func = Expression._get_var_resolver(_var.config_var)
-            _actual_values[_var.standard_var] = _resolve_func(_var.config_var, {**data_context})
+        _globals = functions or globals()
+        return eval(self._code, _globals, self._actual_values(data_context))
+
+    def evaluate_batch(self, columns, functions=None):
+        """
+        evaluate the expression over whole columns, the variables ${var} reading columns[var]
+        Arithmetic, comparison, boolean and conditional expressions over numeric columns are evaluated as NumPy
+        array operations if NumPy is installed, anything else (or a floating point error) row by row
+        The variables of BatchResolvers are resolved for all the rows at once, see evaluate_many
+        :param columns: variable name -> sequence, all of the same length
+        :param functions: globals of the expression, like __call__
+        :return: BatchResult(values, path), values being a NumPy array (VECTORISED) or a list (ROWS)
+        """
+        lengths = {len(column) for column in columns.values()}
+        if len(lengths) != 1:
+            raise ValueError('columns of different lengths or no column: {}'.format(sorted(lengths)))
+        length = lengths.pop()
 
+        _rows = None
+        if any(isinstance(_resolve_func, BatchResolver) for _, _, _resolve_func in self._resolved):
+            _rows = list(_python_rows(columns))
+            _resolved = self._resolve_batch(_rows)
+        else:
+            _resolved = {}
+
+        if np is not None and all(_standard_var in _resolved or _resolve_func is _resolve_variable and
+                                  _config_var in columns
+                                  for _standard_var, _config_var, _resolve_func in self._resolved):
+            values = _evaluate_vectorised(self._compiled,
+                                          {_standard_var: _resolved[_standard_var] if _standard_var in _resolved
+                                           else columns[_config_var]
+                                           for _standard_var, _config_var, _ in self._resolved},
+                                          length)
+            if values is not None:
+                return BatchResult(values, VECTORISED)
+
+        if _rows is None:
+            _rows = _python_rows(columns)
         _globals = functions or globals()
-        return eval(self._compiled, _globals, _actual_values)
+        return BatchResult([eval(self._code, _globals,
+                                 self._actual_values(_row, {_standard_var: _values[_index]
+                                                            for _standard_var, _values in _resolved.items()}))
+                            for _index, _row in enumerate(_rows)], ROWS)
+
+
+def _python_rows(columns):
+    """the rows of the columns as dicts, with python values rather than NumPy scalars, for python semantics"""
+    _names = list(columns)
+    _columns = [column.tolist() if np is not None and isinstance(column, np.ndarray) else column
+                for column in columns.values()]
+    return (dict(zip(_names, _values)) for _values in zip(*_columns))
+
+
+class BatchResolver(ABC):
+    """
+    Variable resolver resolving the variables of many data contexts at once, see Expression.evaluate_many
+    Register it like a resolver function with Expression.register_resolver. Subclasses implement fetch(), e.g. one
+    database query for all the data contexts, and can keep the values in a cache expiring after ttl seconds,
+    keyed by cache_key()
+    """
+    def __init__(self, ttl=None, maxsize=65536):
+        """
+        :param ttl: seconds the values are kept in the cache, None for no cache
+        :param maxsize: maximum number of values in the cache
+        """
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._cache = OrderedDict()  # (config_var, cache key) -> (expiry time, value)
+
+    @abstractmethod
+    def fetch(self, config_vars, data_contexts):
+        """
+        resolve the variables for all the data contexts
+        :param config_vars: list of variable names, e.g. 'ref.price'
+        :param data_contexts: list of dicts
+        :return: config_var -> list of values, one per data context
+        """
+
+    def cache_key(self, data_context):
+        """
+        hashable key of the data context in the cache, None not to cache its values
+        """
+        return None
+
+    def __call__(self, config_var, data_context):
+        return self.resolve_batch([config_var], [data_context])[config_var][0]
+
+    def resolve_batch(self, config_vars, data_contexts):
+        """
+        fetch() through the cache, for the data contexts whose values are not all cached
+        :return: config_var -> list of values, one per data context
+        """
+        if self.ttl is None:
+            return self.fetch(config_vars, data_contexts)
+
+        now = monotonic()
+        keys = [self.cache_key(data_context) for data_context in data_contexts]
+        resolved = {config_var: [None] * len(data_contexts) for config_var in config_vars}
+        missing = OrderedDict()  # ('key', cache key) or ('row', index) if not cached -> indexes of the data contexts
+        for index, key in enumerate(keys):
+            entries = [self._cache.get((config_var, key)) for config_var in config_vars] if key is not None else ()
+            if key is not None and all(entry and entry[0] > now for entry in entries):
+                for config_var, entry in zip(config_vars, entries):
+                    resolved[config_var][index] = entry[1]
+            else:
+                missing.setdefault(('row', index) if key is None else ('key', key), []).append(index)
+
+        if missing:
+            indexes = list(missing.values())
+            fetched = self.fetch(config_vars, [data_contexts[group[0]] for group in indexes])
+            expiry = now + self.ttl
+            for position, group in enumerate(indexes):
+                key = keys[group[0]]
+                for config_var in config_vars:
+                    value = fetched[config_var][position]
+                    for index in group:
+                        resolved[config_var][index] = value
+                    if key is not None:
+                        self._cache[(config_var, key)] = (expiry, value)
+                        self._cache.move_to_end((config_var, key))
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+        return resolved
+
+    def clear_cache(self):
+        self._cache.clear()
+
+
+class _LazyValues(dict):
+    """values of the variables, each resolved when the evaluation first reads it"""
+    __slots__ = ('_resolvers', '_data_context')
+
+    def __init__(self, resolvers, data_context):
+        super().__init__()
+        self._resolvers = resolvers
+        self._data_context = data_context
+
+    def __missing__(self, name):
+        _config_var, _resolve_func = self._resolvers[name]  # KeyError: not a variable, eval reads the globals
+        value = self[name] = _resolve_func(_config_var, self._data_context)
+        return value
+
+
+# operators folded on constant numbers, and the largest exponent folded
+_FOLDED_OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow, ast.BitAnd, ast.BitOr,
+                     ast.BitXor, ast.USub, ast.UAdd, ast.Not, ast.Invert, ast.Eq, ast.NotEq, ast.Lt, ast.LtE,
+                     ast.Gt, ast.GtE)
+_FOLDED_TYPES = (int, float, bool)
+_MAX_FOLDED_EXPONENT = 64
+
+
+def _constant(node):
+    return isinstance(node, ast.Constant) and type(node.value) in _FOLDED_TYPES
+
+
+class _ConstantFolder(ast.NodeTransformer):
+    """
+    fold the operations on numeric constants, and the boolean and conditional expressions whose outcome is known
+    Operations raising (e.g. 1 / 0) are left to raise when evaluated
+    """
+
+    @staticmethod
+    def _fold(node):
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Pow) and abs(node.right.value) > \
+                _MAX_FOLDED_EXPONENT:
+            return node
+        try:
+            value = eval(compile(ast.fix_missing_locations(ast.Expression(node)), '<fold>', 'eval'),
+                         {'__builtins__': {}})
+        except Exception:
+            return node
+        return ast.copy_location(ast.Constant(value), node)
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, _FOLDED_OPERATORS) and _constant(node.left) and _constant(node.right):
+            return self._fold(node)
+        return node
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        return self._fold(node) if isinstance(node.op, _FOLDED_OPERATORS) and _constant(node.operand) else node
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        if all(isinstance(op, _FOLDED_OPERATORS) for op in node.ops) and _constant(node.left) \
+                and all(map(_constant, node.comparators)):
+            return self._fold(node)
+        return node
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        values = []
+        last = len(node.values) - 1
+        for index, value in enumerate(node.values):
+            if index < last and _constant(value) and bool(value.value) is isinstance(node.op, ast.And):
+                continue  # true in an and, false in an or: the next value decides
+            values.append(value)
+            if _constant(value):
+                break  # false in an and, true in an or, or the last value: the outcome
+        if len(values) == 1:
+            return values[0]
+        node.values = values
+        return node
+
+    def visit_IfExp(self, node):
+        self.generic_visit(node)
+        if _constant(node.test):
+            return node.body if node.test.value else node.orelse
+        return node
+
+
+@lru_cache(maxsize=INTERN_CACHE_SIZE)
+def _compile(string):
+    """compile the expression string, one standard variable per distinct variable"""
+    _var_idx = count(1)
+    _standard_vars = {}
+
+    def _standardize_vars(match):
+        _variable = match.group()
+        assert isinstance(_variable, str) and len(_variable) > 3
+        _config_var = _variable[2:-1].strip()
+        if _config_var not in _standard_vars:
+            _standard_vars[_config_var] = ''.join(('__var_', str(next(_var_idx))))
+        return _standard_vars[_config_var]
+
+    tree = ast.parse(Expression.VARIABLE_PATTERN.sub(_standardize_vars, string), mode='eval')
+    tree = ast.fix_missing_locations(_ConstantFolder().visit(tree))
+    names = {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}
+    variables = tuple(CompiledVariable(_config_var, _standard_var)
+                      for _config_var, _standard_var in _standard_vars.items())
+    used = tuple(_var for _var in variables if _var.standard_var in names)
+    return CompiledExpression(ast.unparse(tree), compile(tree, '<expression {!r}>'.format(string), 'eval'),
+                              variables, used)
+
+
+# nodes of the expressions evaluated as NumPy array operations
+_VECTOR_NODES = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare, ast.IfExp, ast.Name, ast.Load,
+                 ast.Constant, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow, ast.USub,
+                 ast.UAdd, ast.Not, ast.And, ast.Or, ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE)
+
+# kinds of the NumPy arrays the columns must convert to: integers and floats
+_VECTOR_KINDS = 'iuf'
+
+
+def _number(value):
+    """booleans as integers in arithmetic, like python"""
+    if isinstance(value, np.ndarray) and value.dtype == np.bool_:
+        return value.astype(np.int64)
+    return value
+
+
+_BINARY_OPERATORS = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv,
+                     ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod, ast.Pow: operator.pow}
+# largest integer result trusted not to have wrapped around, with a margin for the float64 estimate
+_MAX_EXACT_INTEGER = 2 ** 62
+
+
+def _float(value):
+    return value.astype(np.float64) if isinstance(value, (np.ndarray, np.generic)) else float(value)
+
+
+def _binary(name, left, right):
+    """
+    left <op> right on arrays, raising OverflowError where integer arithmetic wraps around instead of growing
+    like python integers: the result is checked against the same operation in float64
+    """
+    func = getattr(operator, name)
+    left, right = _number(left), _number(right)
+    result = func(left, right)
+    if np.asarray(result).dtype.kind in 'iu':
+        info = np.iinfo(result.dtype)
+        estimate = func(_float(left), _float(right))
+        if np.any(estimate > min(info.max, _MAX_EXACT_INTEGER)) or np.any(estimate < max(info.min,
+                                                                                          -_MAX_EXACT_INTEGER)):
+            raise OverflowError('integer overflow in {}'.format(name))
+    return result
+
+
+def _negative(value):
+    """-value, raising OverflowError where integer arithmetic wraps around"""
+    value = _number(value)
+    if np.asarray(value).dtype.kind in 'iu':
+        return _binary('sub', 0, value)
+    return -value
+
+
+def _and(*values):
+    """elementwise python 'and', returning the first false value or the last one"""
+    result = values[-1]
+    for value in reversed(values[:-1]):
+        result = np.where(value, result, value)
+    return result
+
+
+def _or(*values):
+    """elementwise python 'or', returning the first true value or the last one"""
+    result = values[-1]
+    for value in reversed(values[:-1]):
+        result = np.where(value, value, result)
+    return result
+
+
+def _call(name, *args):
+    return ast.Call(ast.Name(name, ast.Load()), list(args), [])
+
+
+class _Vectoriser(ast.NodeTransformer):
+    """rewrite the python operators not working elementwise on arrays into calls of the functions above"""
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        return _call('_binary', ast.Constant(_BINARY_OPERATORS[type(node.op)].__name__), node.left, node.right)
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Not):
+            return _call('_not', node.operand)
+        if isinstance(node.op, ast.USub):
+            return _call('_negative', node.operand)
+        node.operand = _call('_number', node.operand)
+        return node
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        return _call('_and' if isinstance(node.op, ast.And) else '_or', *node.values)
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        if len(node.ops) == 1:
+            return node
+        operands = [node.left] + node.comparators
+        return _call('_and', *(ast.Compare(left, [op], [right])
+                               for left, op, right in zip(operands, node.ops, operands[1:])))
+
+    def visit_IfExp(self, node):
+        self.generic_visit(node)
+        return _call('_where', node.test, node.body, node.orelse)
+
+
+@lru_cache(maxsize=INTERN_CACHE_SIZE)
+def _vectorise(source):
+    """
+    code object evaluating the standardised expression source over arrays, None if it cannot be
+    """
+    tree = ast.parse(source, mode='eval')
+    for node in ast.walk(tree):
+        if not isinstance(node, _VECTOR_NODES) \
+                or isinstance(node, ast.Name) and not node.id.startswith('__var_') \
+                or isinstance(node, ast.Constant) and type(node.value) not in (int, float, bool):
+            return None
+    tree = ast.fix_missing_locations(_Vectoriser().visit(tree))
+    return compile(tree, '<vectorised {!r}>'.format(source), 'eval')
+
+
+def _evaluate_vectorised(source, columns, length):
+    """
+    :param columns: standard variable -> column
+    :return: NumPy array, None if the expression or the columns cannot be evaluated as array operations
+    """
+    code = _vectorise(source)
+    if code is None:
+        return None
+    arrays = {}
+    for name, column in columns.items():
+        array = np.asarray(column)
+        if array.ndim != 1 or array.dtype.kind not in _VECTOR_KINDS:
+            return None
+        arrays[name] = array
+    _globals = {'__builtins__': {}, '_number': _number, '_binary': _binary, '_negative': _negative, '_and': _and,
+                '_or': _or, '_not': np.logical_not, '_where': np.where}
+    try:
+        with np.errstate(all='raise'):
+            result = eval(code, _globals, arrays)
+    except (ArithmeticError, ValueError):  # e.g. division by zero, negative integer power, integer overflow
+        return None
+    return np.broadcast_to(result, (length,)).copy() if np.ndim(result) == 0 else result
@@ -1,9 +1,25 @@
 import copy
+import json
 
-from .meta import Field, FieldDescription
+from .meta import Field, FieldDescription, FieldType, freeze
 from .base import MapperBase
 
 
+def _field_cache(instance):
+    """
+    dict of the values fields cache with the instance (see MapperBase._field_cache), None if it cannot hold one
+    """
+    try:
+        return instance._field_cache
+    except AttributeError:
+        pass
+    try:
+        cache = instance._field_cache = {}
+    except AttributeError:  # not a MapperBase, e.g. the holders of columnar
+        return None
+    return cache
+
+
 class ObjField(Field):
     """Field type for nested objects"""
     def __init__(self, mapping=None, name=None, default=None):
@@ -11,6 +27,10 @@ class ObjField(Field):
         super().__init__(name=name,
                          description=FieldDescription(lambda: default.copy(), str, str))
         self.mapping = mapping
+        self._default_value = default
+
+    def structure(self):
+        return type(self), self.name, self.mapping, freeze(self._default_value)
 
     def _to_python(self, value):
         if self.mapping is None:
@@ -55,18 +75,87 @@ class TypedField(Field):
         return value
 
 
+class JsonField(Field):
+    """
+    Field type for JSON documents, held encoded in the dict
+    The document is decoded on first read and kept with the instance until the encoded value changes, along with a
+    snapshot decoded from the same value. It is encoded on assignment, and documents modified in place (no longer
+    equal to their snapshot) are encoded again by generate(), see flush()
+    """
+    def __init__(self, name=None, default=None, encoder=json.dumps, decoder=json.loads):
+        super().__init__(name=name, type_=FieldType.Json, description=FieldDescription(default, encoder, decoder))
+
+    def __get__(self, instance, type_):
+        if instance is None:  # operates at class level
+            return self
+        value = instance._data.get(self.name)
+        documents = _field_cache(instance) if value is not None else None
+        if documents is None:
+            return super().__get__(instance, type_)
+
+        # (encoded value, document, snapshot of the document when cached)
+        document = documents.get(self.name)
+        if document is None or document[0] is not value:
+            document = documents[self.name] = (value, self._to_python(value), self._to_python(value))
+        return document[1]
+
+    def __set__(self, instance, value):
+        super().__set__(instance, value)
+        documents = _field_cache(instance) if value is not None else None
+        if documents is not None:
+            encoded = instance._data[self.name]
+            documents[self.name] = (encoded, value, self._to_python(encoded))
+
+    def flush(self, instance):
+        """
+        encode again the document cached with the instance if it was modified in place
+        :param instance: mapper instance
+        :return: None
+        """
+        documents = _field_cache(instance)
+        document = documents.get(self.name) if documents else None
+        if document is None or instance._data.get(self.name) is not document[0] or document[1] == document[2]:
+            return
+        encoded = instance._data[self.name] = self._from_python(document[1])
+        documents[self.name] = (encoded, document[1], self._to_python(encoded))
+
+
+_UNSET = object()
+
+
 class ListField(Field):
-    """Field type for sequences"""
+    """
+    Field type for sequences
+    The proxy of an instance's list is kept with the instance, so element conversions are cached across reads
+    """
     def __init__(self, field, name=None, default=None):
         default = default or []
         super().__init__(name=name, description=FieldDescription(lambda: copy.copy(default),
                                                                  str, str))
-        if type(field) is type:
+        if isinstance(field, type):
             if issubclass(field, Field):
                 field = field()
             elif issubclass(field, MapperBase):
                 field = ObjField(field)
         self.field = field
+        self._default_value = default
+
+    def structure(self):
+        field = self.field.structure() if isinstance(self.field, Field) else self.field
+        return type(self), self.name, field, freeze(self._default_value)
+
+    def __get__(self, instance, type_):
+        if instance is None:  # operates at class level
+            return self
+        value = instance._data.get(self.name)
+        proxies = _field_cache(instance) if value is not None else None
+        if proxies is None:
+            return super().__get__(instance, type_)
+
+        proxy = proxies.get(self.name)
+        if proxy is None or proxy.list is not value:
+            proxy = proxies[self.name] = self._to_python(value)
+        return proxy
 
     def _to_python(self, value):
         return self.Proxy(value, self.field)
@@ -75,9 +164,38 @@ class ListField(Field):
         return [self.field._from_python(item) for item in value]
 
     class Proxy(list):
+        """
+        List of python values over the list of raw values
+        Elements are converted on first read and cached until changed through the proxy,
+        slices are views sharing the list and the cache
+        """
         def __init__(self, list_, field):
             self.list = list_
             self.field = field
+            self._cache = [_UNSET] * len(list_)
+
+        def _item(self, index):
+            if len(self._cache) != len(self.list):  # raw list changed behind the proxy
+                self._cache = [_UNSET] * len(self.list)
+            value = self._cache[index]
+            if value is _UNSET:
+                value = self._cache[index] = self.field._to_python(self.list[index])
+            return value
+
+        def _raw(self, value):
+            """
+            raw form of value if it compares like value to the python elements, so no element needs converting,
+            else _UNSET: the converter keeps the type (strings, nested objects) and value is of that type
+            """
+            field = self.field
+            if isinstance(field, ObjField):
+                if field.mapping is None:
+                    return value
+                if isinstance(value, field.mapping):
+                    return value.generate()
+            elif type(field) is Field and field.type is FieldType.String and isinstance(value, str):
+                return value
+            return _UNSET
 
         def __lt__(self, other):
             return self.list < other
@@ -108,36 +226,36 @@ class ListField(Field):
 
         def __delitem__(self, index):
             del self.list[index]
+            del self._cache[index]
 
         def __getitem__(self, index):
-            return self.field._to_python(self.list[index])
+            if isinstance(index, slice):
+                return ListField.View(self, range(len(self.list))[index])
+            return self._item(index)
 
         def __setitem__(self, index, value):
-            self.list[index] = self.field._from_python(value)
-
-        def __delslice__(self, i, j):
-            del self.list[i:j]
-
-        def __getslice__(self, i, j):
-            return ListField.Proxy(self.list[i:j], self.field)
-
-        def __setslice__(self, i, j, seq):
-            self.list[i:j] = (self.field._from_python(v) for v in seq)
+            if isinstance(index, slice):
+                value = [self.field._from_python(v) for v in value]
+                self.list[index] = value
+                self._cache[index] = [_UNSET] * len(value)
+            else:
+                self.list[index] = self.field._from_python(value)
+                self._cache[index] = _UNSET
 
         def __contains__(self, value):
-            for item in self.list:
-                if self.field._to_python(item) == value:
-                    return True
-            return False
+            raw = self._raw(value)
+            if raw is not _UNSET:
+                return raw in self.list
+            return any(item == value for item in self)
 
         def __iter__(self):
-            for index in range(len(self)):
-                yield self[index]
+            for index in range(len(self.list)):
+                yield self._item(index)
 
         def __len__(self):
             return len(self.list)
 
-        def __nonzero__(self):
+        def __bool__(self):
             return bool(self.list)
 
         def append(self, *args, **kwargs):
@@ -149,8 +267,12 @@ class ListField(Field):
             else:
                 value = kwargs
             self.list.append(self.field._from_python(value))
+            self._cache.append(_UNSET)
 
         def count(self, value):
+            raw = self._raw(value)
+            if raw is not _UNSET:
+                return self.list.count(raw)
             return [i for i in self].count(value)
 
         def extend(self, list):
@@ -158,7 +280,13 @@ class ListField(Field):
                 self.append(item)
 
         def index(self, value):
-            return self.list.index(self.field._from_python(value))
+            raw = self._raw(value)
+            if raw is not _UNSET:
+                return self.list.index(raw)
+            for index, item in enumerate(self):
+                if item == value:
+                    return index
+            raise ValueError('{!r} is not in list'.format(value))
 
         def insert(self, idx, *args, **kwargs):
             if args or not isinstance(self.field, ObjField):
@@ -169,9 +297,68 @@ class ListField(Field):
             else:
                 value = kwargs
             self.list.insert(idx, self.field._from_python(value))
+            self._cache.insert(idx, _UNSET)
 
         def remove(self, value):
-            return self.list.remove(self.field._from_python(value))
+            del self[self.index(value)]
 
         def pop(self, *args):
-            return self.field._to_python(self.list.pop(*args))
+            value = self._item(*args) if args else self._item(-1)
+            del self[args[0] if args else -1]
+            return value
+
+    class View:
+        """
+        Slice of a Proxy, sharing its list and cache
+        The view keeps the positions it was taken at, so it should not outlive changes of the list length
+        """
+        def __init__(self, proxy, indices):
+            self.proxy = proxy
+            self.indices = indices
+
+        @property
+        def list(self):
+            """raw values"""
+            return [self.proxy.list[index] for index in self.indices]
+
+        def __eq__(self, other):
+            return self.list == other
+
+        def __ne__(self, other):
+            return self.list != other
+
+        def __repr__(self):
+            return repr(self.list)
+
+        def __len__(self):
+            return len(self.indices)
+
+        def __bool__(self):
+            return bool(self.indices)
+
+        def __getitem__(self, index):
+            if isinstance(index, slice):
+                return ListField.View(self.proxy, self.indices[index])
+            return self.proxy[self.indices[index]]
+
+        def __setitem__(self, index, value):
+            self.proxy[self.indices[index]] = value
+
+        def __iter__(self):
+            for index in self.indices:
+                yield self.proxy[index]
+
+        def __contains__(self, value):
+            raw = self.proxy._raw(value)
+            if raw is not _UNSET:
+                return raw in self.list
+            return any(item == value for item in self)
+
+        def count(self, value):
+            return [i for i in self].count(value)
+
+        def index(self, value):
+            for index, item in enumerate(self):
+                if item == value:
+                    return index
+            raise ValueError('{!r} is not in list'.format(value))
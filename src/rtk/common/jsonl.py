@@ -0,0 +1,107 @@
+r"""
+Streaming JSON lines reader for mapper types
+"""
+import json
+import os
+from collections import Counter
+from decimal import InvalidOperation
+
+from .columnar import RecordBatch
+
+__all__ = ['JsonLinesReader']
+
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+# what a converter raises on a value it cannot read
+CONVERSION_ERRORS = (TypeError, ValueError, AttributeError, KeyError, InvalidOperation)
+
+
+class JsonLinesReader:
+    """
+    Read a JSON lines file into instances (or RecordBatch of instances) of a mapper, in bounded memory
+    The file is read in large chunks; each line is validated against the mapper fields, and the lines with
+    invalid values are skipped and counted instead of raising, see errors / rejected / malformed
+    """
+    def __init__(self, mapper, path_or_file, chunk_size=DEFAULT_CHUNK_SIZE, batch_size=None):
+        """
+        :param mapper: MapperBase subclass
+        :param path_or_file: file path, or file object opened in text or binary mode
+        :param chunk_size: number of bytes (or chars) read at once
+        :param batch_size: yield a RecordBatch per batch_size lines instead of one instance per line
+        """
+        self.mapper = mapper
+        self.path_or_file = path_or_file
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+        self.lines = 0
+        self.rejected = 0  # lines with invalid field values
+        self.malformed = 0  # lines not holding a JSON object
+        self.errors = Counter()  # field name -> number of invalid values
+        self._converters = [(field.name, field._to_python) for field in mapper._fields.values()]
+
+    def __iter__(self):
+        rows = self._rows()
+        if self.batch_size is None:
+            return map(self.mapper.build_from, rows)
+        return self._batches(rows)
+
+    def _batches(self, rows):
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == self.batch_size:
+                yield RecordBatch.from_dicts(self.mapper, batch)
+                batch = []
+        if batch:
+            yield RecordBatch.from_dicts(self.mapper, batch)
+
+    def _rows(self):
+        for line in self._lines():
+            self.lines += 1
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            if not isinstance(row, dict):
+                self.malformed += 1
+                continue
+            if self._validate(row):
+                yield row
+            else:
+                self.rejected += 1
+
+    def _validate(self, row):
+        valid = True
+        for name, convert in self._converters:
+            value = row.get(name)
+            if value is None:
+                continue
+            try:
+                convert(value)
+            except CONVERSION_ERRORS:
+                self.errors[name] += 1
+                valid = False
+        return valid
+
+    def _lines(self):
+        if isinstance(self.path_or_file, (str, os.PathLike)):
+            with open(self.path_or_file, 'rb') as file:
+                yield from self._split(file)
+        else:
+            yield from self._split(self.path_or_file)
+
+    def _split(self, file):
+        tail = None
+        while True:
+            chunk = file.read(self.chunk_size)
+            if not chunk:
+                break
+            if tail is None:
+                tail, newline = chunk[:0], '\n' if isinstance(chunk, str) else b'\n'
+            lines = (tail + chunk).split(newline)
+            tail = lines.pop()  # the last line may continue in the next chunk
+            for line in lines:
+                if line.strip():
+                    yield line
+        if tail and tail.strip():
+            yield tail
@@ -1,12 +1,17 @@
+import json
 from collections import namedtuple
 from datetime import date, datetime
 from decimal import Decimal
 from enum import Enum
+from functools import lru_cache
 from time import strptime
 
 __all__ = ['FieldType',
            'Field',
-           'MetaMapper']
+           'MetaMapper',
+           'CompactStorage',
+           'cache_dates',
+           'specialisable']
 
 
 class FieldType(Enum):
@@ -22,19 +27,57 @@ class FieldType(Enum):
 FieldDescription = namedtuple('FieldDescription', ('default', 'frompython', 'topython'))
 
 
+def _parse_date(value):
+    # fast path for the fixed %Y-%m-%d layout, anything else goes through strptime as before
+    # (fromisoformat accepts more, e.g. 2019-W01-1, so only digits between the separators)
+    if len(value) == 10 and value[4] == '-' and value[7] == '-' and (value[:4] + value[5:7] + value[8:]).isdigit():
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            pass
+    return date(*strptime(value, '%Y-%m-%d')[:3])
+
+
+_parse_date_cached = _parse_date
+
+
+def cache_dates(maxsize=4096):
+    """
+    Keep the dates parsed by convert_to_python_date in a bounded LRU cache, for feeds repeating the same dates
+    :param maxsize: number of dates to keep, 0 to disable the cache
+    :return: None
+    """
+    global _parse_date_cached
+    _parse_date_cached = lru_cache(maxsize=maxsize)(_parse_date) if maxsize else _parse_date
+
+
 def convert_to_python_date(value):
     if isinstance(value, str):
         try:
-            value = date(*strptime(value, '%Y-%m-%d')[:3])
+            value = _parse_date_cached(value)
         except ValueError:
             raise ValueError('Invalid ISO date: {}'.format(value))
     return value
 
 
+def _parse_datetime(value):
+    # fast path for the fixed %Y-%m-%dT%H:%M:%S.%fZ layout (1 to 6 digits of fraction), only digits between the
+    # separators as fromisoformat accepts more, e.g. a time zone
+    if 22 <= len(value) <= 27 and value[-1] == 'Z' and value[4] == '-' and value[7] == '-' and value[10] == 'T' \
+            and value[13] == ':' and value[16] == ':' and value[19] == '.' \
+            and (value[:4] + value[5:7] + value[8:10] + value[11:13] + value[14:16] + value[17:19] +
+                 value[20:-1]).isdigit():
+        try:
+            return datetime.fromisoformat(value[:-1])
+        except ValueError:
+            pass
+    return datetime.strptime(value, "%Y-%m-%dT%H:%M:%S.%fZ")
+
+
 def convert_to_python_datetime(value):
     assert isinstance(value, str)
     try:
-        return datetime.strptime(value, "%Y-%m-%dT%H:%M:%S.%fZ")
+        return _parse_datetime(value)
     except ValueError as e:
         raise ValueError('Invalid ISO date/time %r' % value) from e
 
@@ -50,14 +93,32 @@ DEFAULT_CONVERTER = {
                                      convert_to_python_date),
     FieldType.Timestamp: FieldDescription(None,
                                           lambda v: v.isoformat()[:-3] + 'Z',
-                                          convert_to_python_datetime)
+                                          convert_to_python_datetime),
+    FieldType.Json: FieldDescription(None, json.dumps, json.loads)
 }
 
 
+def freeze(value):
+    """
+    hashable equivalent of value built of dicts, lists and sets
+    :param value: any value
+    :return: hashable value, equal for equal inputs
+    """
+    if isinstance(value, dict):
+        return dict, frozenset((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return type(value), tuple(map(freeze, value))
+    if isinstance(value, (set, frozenset)):
+        return frozenset, frozenset(map(freeze, value))
+    return value
+
+
 class IConverter:
     """
     Interface of converter
     """
+    __slots__ = ()
+
     def _to_python(self, value):
         """
         convert to python object
@@ -76,21 +137,30 @@ class IConverter:
 class Field(IConverter):
     """
     Field Descriptor of Python <-> SA Mapping
+    Each field holds its own converters, unless a subclass implements them as methods
     """
+    __slots__ = ('name', 'type', 'default', '_from_python', '_to_python')
+
     def __init__(self, name=None, type_=FieldType.String, description=None):
         self.name = name
         self.type = type_
-        if self.type == FieldType.Json:
-            raise NotImplementedError('Json field not implemented yet!')
 
         description = description if description else DEFAULT_CONVERTER[type_]
         self.default = description.default
 
         # use the field converter
-        Field._from_python = description.frompython
-        Field._to_python = description.topython
-        # self.__from_python = description.frompython
-        # self.__to_python = description.topython
+        cls = type(self)
+        if cls._from_python is Field._from_python:
+            self._from_python = description.frompython
+        if cls._to_python is Field._to_python:
+            self._to_python = description.topython
+
+    def structure(self):
+        """
+        hashable description of the field, equal for fields behaving the same
+        :return: tuple
+        """
+        return type(self), self.name, self.type, freeze(self.default), self._from_python, self._to_python
 
     def __get__(self, instance, type_):
         if instance is None:  # operates at class level
@@ -108,27 +178,314 @@ class Field(IConverter):
             value = self._from_python(value)
         instance._data[self.name] = value
 
-    # def _to_python(self, value):
-    #     return self.__to_python(value)
-    #
-    # def _from_python(self, value):
-    #     return self.__from_python(value)
+
+_MISSING = object()
+
+
+def specialisable(func):
+    """
+    decorator
+    Mark a generic MapperBase method that MetaMapper may replace by a per-class compiled version
+    """
+    func._specialisable = True
+    return func
+
+
+def _generic_method(cls, attr_name):
+    """
+    The generic implementation of attr_name that cls resolves to, skipping compiled ones
+    :return: the generic attribute, or None if the class or a parent overrides it
+    """
+    for klass in cls.__mro__:
+        attr = klass.__dict__.get(attr_name)
+        if attr is None:
+            continue
+        func = getattr(attr, '__func__', attr)  # unwrap classmethod
+        if getattr(func, '_compiled', False):
+            continue
+        return attr if getattr(func, '_specialisable', False) else None
+    return None
+
+
+def _is_plain_field(field):
+    """field whose get/set are the generic Field ones, so the converter can be inlined"""
+    field_type = type(field)
+    return field_type.__get__ is Field.__get__ and field_type.__set__ is Field.__set__
+
+
+def _compile(source, name, namespace):
+    code = compile(source, '<codec {}>'.format(name), 'exec')
+    exec(code, namespace)
+    func = namespace[name]
+    func._compiled = True
+    return func
+
+
+def _slot_name(attr_name):
+    return '_raw_' + attr_name
+
+
+def compile_init(fields, generic, slots=None):
+    """
+    Generate __init__ for the fields with the loop unrolled and the converters bound directly
+    Instances of subclasses with other fields (reaching it through super().__init__) go through generic
+    :param fields: attr name -> Field
+    :param generic: generic __init__
+    :param slots: field name -> slot name of compact mappers, None to store in _data
+    :return: function
+    """
+    namespace = {'_MISSING': _MISSING, '_fields': fields, '_generic': generic}
+    lines = ['def __init__(self, **values):',
+             '    if type(self)._fields is not _fields:',
+             '        return _generic(self, **values)',
+             '    pop = values.pop']
+    if slots is None:
+        lines.append('    self._data = data = {}')
+    for index, (attr_name, field) in enumerate(fields.items()):
+        if not _is_plain_field(field):
+            lines.append('    setattr(self, {0!r}, pop({0!r}) if {0!r} in values else getattr(self, {0!r}))'
+                         .format(attr_name))
+            continue
+
+        default = field.default
+        if callable(default):
+            namespace['_default_%d' % index] = default
+            lines.append('    value = pop({!r}, _MISSING)'.format(attr_name))
+            lines.append('    if value is _MISSING:')
+            lines.append('        value = _default_%d()' % index)
+        elif default is None:
+            lines.append('    value = pop({!r}, None)'.format(attr_name))
+        else:
+            namespace['_default_%d' % index] = default
+            lines.append('    value = pop({!r}, _default_{})'.format(attr_name, index))
+
+        namespace['_from_python_%d' % index] = field._from_python
+        lines.append('    if value is not None:')
+        lines.append('        value = _from_python_%d(value)' % index)
+        if slots is None:
+            lines.append('    data[{!r}] = value'.format(field.name))
+        else:
+            lines.append('    self.{} = value'.format(slots[field.name]))
+    return _compile('\n'.join(lines), '__init__', namespace)
+
+
+def compile_build_from(fields, generic, slots=None):
+    """
+    Generate build_from which attaches the data without running __init__ on throwaway defaults
+    Subclasses with other fields (reaching it through super().build_from) go through generic
+    :param fields: attr name -> Field
+    :param generic: generic build_from (classmethod)
+    :param slots: field name -> slot name of compact mappers, None to keep data as _data
+    :return: classmethod
+    """
+    lines = ['def build_from(cls, data):',
+             '    if cls._fields is not _fields:',
+             '        return _generic(cls, data)',
+             '    instance = _new(cls)']
+    if slots is None:
+        lines.append('    instance._data = data')
+    else:
+        for name, slot in slots.items():
+            lines.append('    if {0!r} in data:'.format(name))
+            lines.append('        instance.{1} = data[{0!r}]'.format(name, slot))
+    lines.append('    return instance')
+    namespace = {'_new': object.__new__, '_fields': fields, '_generic': generic.__func__}
+    return classmethod(_compile('\n'.join(lines), 'build_from', namespace))
+
+
+def compile_generate(fields, generic, slots):
+    """
+    Generate generate() of compact mappers, collecting the set slots into a dict
+    Instances of subclasses with other fields (reaching it through super().generate) go through generic
+    :param fields: attr name -> Field
+    :param generic: generic generate
+    :param slots: field name -> slot name
+    :return: function
+    """
+    lines = ['def generate(self):',
+             '    if type(self)._fields is not _fields:',
+             '        return _generic(self)',
+             '    data = {}']
+    for name, slot in slots.items():
+        lines.append('    try:')
+        lines.append('        data[{!r}] = self.{}'.format(name, slot))
+        lines.append('    except AttributeError:')
+        lines.append('        pass')
+    lines.append('    return data')
+    return _compile('\n'.join(lines), 'generate', {'_fields': fields, '_generic': generic})
+
+
+class CompactSlot:
+    """
+    Field accessor of compact mappers, converting the raw value held in a slot
+    An unset slot is a missing key, read as the field default
+    """
+    __slots__ = ('field', '_get', '_set')
+
+    def __init__(self, field):
+        self.field = field
+
+    def bind(self, slot):
+        self._get = slot.__get__
+        self._set = slot.__set__
+
+    def __get__(self, instance, type_):
+        if instance is None:  # operates at class level
+            return self.field
+        try:
+            value = self._get(instance)
+        except AttributeError:
+            value = None
+        if value is not None:
+            return self.field._to_python(value)
+        default = self.field.default
+        if default is not None:
+            value = default() if callable(default) else default
+        return value
+
+    def __set__(self, instance, value):
+        if value is not None:
+            value = self.field._from_python(value)
+        self._set(instance, value)
+
+
+class CompactStorage:
+    """
+    Mixin of compact mappers (declared with compact=True)
+    The raw value of each field is held in a slot instead of an instance dict plus a _data dict,
+    so only field keys can be stored, and generate() returns a new dict on each call
+    """
+    __slots__ = ()
+
+    @specialisable
+    def __init__(self, **values):
+        for attr_name in self._fields:
+            setattr(self, attr_name, values.pop(attr_name) if attr_name in values else getattr(self, attr_name))
+
+    @classmethod
+    @specialisable
+    def build_from(cls, data):
+        instance = cls.__new__(cls)
+        for name, slot in cls._slots.items():
+            if name in data:
+                setattr(instance, slot, data[name])
+        return instance
+
+    @specialisable
+    def generate(self):
+        data = {}
+        for name, slot in self._slots.items():
+            try:
+                data[name] = getattr(self, slot)
+            except AttributeError:
+                pass
+        return data
+
+    def __repr__(self):
+        return '<{}: {}>'.format(self.__class__.__name__, self.generate())
+
+    def __iter__(self):
+        return iter(self.generate())
+
+    def __len__(self):
+        return len(self.generate())
+
+    def __delitem__(self, name):
+        try:
+            delattr(self, self._slots[name])
+        except AttributeError:
+            raise KeyError(name) from None
+
+    def __getitem__(self, name):
+        try:
+            return getattr(self, self._slots[name])
+        except AttributeError:
+            raise KeyError(name) from None
+
+    def __setitem__(self, name, value):
+        setattr(self, self._slots[name], value)
+
+    def get(self, name, default=None):
+        slot = self._slots.get(name)
+        return default if slot is None else getattr(self, slot, default)
+
+    def setdefault(self, name, default):
+        slot = self._slots[name]
+        try:
+            return getattr(self, slot)
+        except AttributeError:
+            setattr(self, slot, default)
+            return default
+
+    def items(self):
+        return self.generate().items()
 
 
 class MetaMapper(type):
     """
     Metaclass of all Python object <-> dict structure
     Create an internal class attribute _fields to hold all Field descriptions, including those from parents
+
+    Unless the class is declared with codec=False, the generic __init__/build_from are replaced by
+    versions compiled for the class's fields, as long as neither is overridden by the class or a parent.
+    Declared with compact=True (inherited by subclasses), instances hold the field values in slots,
+    see CompactStorage
     """
-    def __new__(meta, name, bases, cls_dict):
+    def __new__(meta, name, bases, cls_dict, codec=None, compact=False):
         fields = {}
         for base in bases:
             if hasattr(base, '_fields'):
                 fields.update(base._fields)
+        own_fields = {}
         for attr_name, attr_val in cls_dict.items():
             if isinstance(attr_val, Field):
                 if not attr_val.name:
                     attr_val.name = attr_name
-                fields[attr_name] = attr_val
+                own_fields[attr_name] = attr_val
+        fields.update(own_fields)
         cls_dict['_fields'] = fields
-        return super().__new__(meta, name, bases, cls_dict)
+        # fields caching values with the instances, to flush into the dict on generate(), e.g. JsonField
+        cls_dict['_flushed_fields'] = tuple(field for field in fields.values() if hasattr(field, 'flush'))
+
+        inherits_compact = any(issubclass(base, CompactStorage) for base in bases)
+        if compact or inherits_compact:
+            if not inherits_compact:
+                bases = (CompactStorage,) + bases
+            # the fields of a non-compact parent get their slots here too
+            meta._make_compact(cls_dict, fields, own_fields if inherits_compact else fields)
+
+        cls = super().__new__(meta, name, bases, cls_dict)
+        for attr_name in fields:
+            if isinstance(cls.__dict__.get(attr_name), CompactSlot):
+                cls.__dict__[attr_name].bind(cls.__dict__[_slot_name(attr_name)])
+        if codec is not None:
+            cls._codec = codec
+        if fields:
+            meta._specialise(cls)
+        return cls
+
+    @staticmethod
+    def _make_compact(cls_dict, fields, slotted_fields):
+        for attr_name, field in slotted_fields.items():
+            if not _is_plain_field(field):
+                raise TypeError('Compact mapper does not support field {} of {}'
+                                .format(attr_name, type(field).__name__))
+            cls_dict[attr_name] = CompactSlot(field)
+        cls_dict['__slots__'] = tuple(map(_slot_name, slotted_fields))
+        cls_dict['_slots'] = {field.name: _slot_name(attr_name) for attr_name, field in fields.items()}
+
+    @staticmethod
+    def _specialise(cls):
+        # a parent's compiled methods do not know about our fields, so fall back to the generic ones
+        generic_init = _generic_method(cls, '__init__')
+        generic_build_from = _generic_method(cls, 'build_from')
+        generic_generate = _generic_method(cls, 'generate')
+        compiled = getattr(cls, '_codec', False) and generic_init is not None
+        slots = getattr(cls, '_slots', None)
+        if generic_init is not None:
+            cls.__init__ = compile_init(cls._fields, generic_init, slots) if compiled else generic_init
+        if generic_build_from is not None:
+            cls.build_from = (compile_build_from(cls._fields, generic_build_from, slots) if compiled
+                              else generic_build_from)
+        if generic_generate is not None:
+            cls.generate = compile_generate(cls._fields, generic_generate, slots) if compiled else generic_generate
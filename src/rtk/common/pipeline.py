@@ -0,0 +1,243 @@
+r"""
+Lazy pipelines over the sections of csv files
+
+A source such as csvutil.iter_sections yields Section(header, rows) pairs, rows being an iterator over the records
+of the section. Stages take such an iterable and return another one (or a result, for the last stage); pipe()
+chains them, e.g.
+
+    pipe(iter_sections('in.csv'), filter_rows(is_live), map_rows(fix_dates), threaded(), write_csv('out.csv'))
+
+Everything runs lazily, one record at a time, and stopping early (e.g. breaking out of a loop) stops reading.
+The rows of a section can only be read until the next section is requested.
+"""
+import csv
+import queue
+import threading
+from collections import namedtuple
+from itertools import islice
+
+from .compression import open_file
+
+__all__ = ['Section',
+           'pipe',
+           'map_rows',
+           'filter_rows',
+           'parse_records',
+           'batch',
+           'threaded',
+           'write_csv']
+
+Section = namedtuple('Section', 'header rows')
+
+# number of items of the queue between the threads, each item holding up to DEFAULT_CHUNK_ROWS rows
+DEFAULT_QUEUE_SIZE = 64
+DEFAULT_CHUNK_ROWS = 256
+
+
+class _Lookahead:
+    """iterator allowing to peek at the next item, None at the end"""
+    __slots__ = ('_iterator', '_next')
+
+    def __init__(self, iterable):
+        self._iterator = iter(iterable)
+        self._next = next(self._iterator, None)
+
+    def peek(self):
+        return self._next
+
+    def pop(self):
+        item, self._next = self._next, next(self._iterator, None)
+        return item
+
+
+def group_sections(items, header_of):
+    """
+    group a flat stream of headers and rows into sections, rows before the first header having the header []
+    :param items: iterable of headers and rows, not holding None
+    :param header_of: item -> the header if the item is one, else None
+    :return: generator of Section
+    """
+    items = _Lookahead(items)
+    while items.peek() is not None:
+        header = header_of(items.peek())
+        if header is None:
+            header = []
+        else:
+            items.pop()
+        rows = _section_rows(items, header_of)
+        yield Section(header, rows)
+        for _ in rows:  # skip the rows left by the consumer
+            pass
+
+
+def _section_rows(items, header_of):
+    while items.peek() is not None and header_of(items.peek()) is None:
+        yield items.pop()
+
+
+def pipe(source, *stages):
+    """
+    chain the stages
+    :param source: iterable of Section
+    :param stages: callables taking the output of the previous stage
+    :return: output of the last stage
+    """
+    for stage in stages:
+        source = stage(source)
+    return source
+
+
+def _map_sections(function, sections):
+    for section in sections:
+        yield Section(section.header, function(section.rows))
+
+
+def map_rows(function):
+    """
+    stage replacing each row by function(row)
+    """
+    return lambda sections: _map_sections(lambda rows: map(function, rows), sections)
+
+
+def filter_rows(predicate):
+    """
+    stage keeping the rows for which predicate(row) is true
+    """
+    return lambda sections: _map_sections(lambda rows: filter(predicate, rows), sections)
+
+
+def _parse_records(record_parser, sections):
+    for section in sections:
+        record_parser.section_done()
+        record_parser.header = section.header
+        yield Section(section.header, _parsed(record_parser, section.rows))
+
+
+def _parsed(record_parser, rows):
+    for row in rows:
+        record_parser(row)
+        yield row
+
+
+def parse_records(record_parser):
+    """
+    stage feeding the rows to record_parser (RecordParserBase) like process_csv, passing them on once processed
+    """
+    return lambda sections: _parse_records(record_parser, sections)
+
+
+def _batches(rows, size):
+    rows = iter(rows)
+    while True:
+        rows_batch = list(islice(rows, size))
+        if not rows_batch:
+            return
+        yield rows_batch
+
+
+def batch(size):
+    """
+    stage grouping the rows of each section in lists of up to size rows
+    """
+    return lambda sections: _map_sections(lambda rows: _batches(rows, size), sections)
+
+
+class _Header:
+    """queue item starting a section"""
+    __slots__ = ('header',)
+
+    def __init__(self, header):
+        self.header = header
+
+
+class _Failed:
+    """queue item carrying the exception raised by the producer"""
+    __slots__ = ('error',)
+
+    def __init__(self, error):
+        self.error = error
+
+
+_END = object()
+
+
+def _threaded(sections, maxsize, chunk_rows):
+    items = queue.Queue(maxsize)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for section in sections:
+                if not put(_Header(section.header)):
+                    return
+                for rows_chunk in _batches(section.rows, chunk_rows):
+                    if not put(rows_chunk):
+                        return
+            put(_END)
+        except BaseException as error:
+            put(_Failed(error))
+        finally:
+            close = getattr(sections, 'close', None)
+            if close:
+                close()
+
+    def consume():
+        while True:
+            item = items.get()
+            if item is _END:
+                return
+            if isinstance(item, _Failed):
+                raise item.error
+            if isinstance(item, _Header):
+                yield item
+            else:
+                yield from item
+
+    producer = threading.Thread(target=produce, name='pipeline-stage', daemon=True)
+    producer.start()
+    try:
+        yield from group_sections(consume(), lambda item: item.header if isinstance(item, _Header) else None)
+    finally:
+        stop.set()
+        producer.join()
+
+
+def threaded(maxsize=DEFAULT_QUEUE_SIZE, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    stage running the previous stages in a background thread, handing the rows over in chunks through a bounded
+    queue, so that reading and writing overlap with parsing. Exceptions of the previous stages are raised again
+    by the next ones
+    :param maxsize: maximum number of chunks in the queue
+    :param chunk_rows: maximum number of rows per chunk
+    """
+    return lambda sections: _threaded(sections, maxsize, chunk_rows)
+
+
+def _write_csv(output_file_path, sections):
+    count = 0
+    with open_file(output_file_path, 'w') as output_file:
+        writer = csv.writer(output_file, lineterminator='\n')
+        for section in sections:
+            if section.header:
+                writer.writerow(section.header)
+            for row in section.rows:
+                writer.writerow(row)
+                count += 1
+    return count
+
+
+def write_csv(output_file_path):
+    """
+    last stage writing the sections to a csv file, like process_csv, compressed according to its extension
+    :return: stage returning the number of rows written
+    """
+    return lambda sections: _write_csv(output_file_path, sections)
@@ -1,9 +1,19 @@
+import heapq
+import io
+import json
+import locale
 import os
 import re
+import sys
 
 from abc import ABC, abstractmethod
-from datetime import datetime
+from array import array
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
 from collections import namedtuple, UserList
+from collections.abc import MutableSequence
+from itertools import chain
 
 
 class Predicate(ABC):
@@ -42,8 +52,11 @@ class TimeRangePredicate(Predicate):
         self.end = datetime.strptime(end, TimeRangePredicate.TIME_FMT) if end else None
 
     def __call__(self, record):
-        start_ok = record.props.timestamp > self.start if self.start else True
-        end_ok = record.props.timestamp < self.end if self.end else True
+        timestamp = record.props.timestamp
+        if isinstance(timestamp, int):  # epoch microseconds
+            timestamp = from_microseconds(timestamp)
+        start_ok = timestamp > self.start if self.start else True
+        end_ok = timestamp < self.end if self.end else True
         return start_ok and end_ok
 
 
@@ -59,7 +72,10 @@ class LogRecord:
         self.original = line
 
     def __str__(self):
-        return f'{self.props.seq:5d} {self.props.timestamp.isoformat(timespec="milliseconds")} {self.original}'
+        timestamp = self.props.timestamp
+        if isinstance(timestamp, int):  # epoch microseconds
+            timestamp = from_microseconds(timestamp)
+        return f'{self.props.seq:5d} {timestamp.isoformat(timespec="milliseconds")} {self.original}'
 
 
 class Filter:
@@ -83,6 +99,331 @@ class Filter:
             return True
 
 
+EPOCH = datetime(1970, 1, 1)
+
+
+def to_microseconds(timestamp: datetime) -> int:
+    """naive datetime -> microseconds since epoch"""
+    return (timestamp - EPOCH) // timedelta(microseconds=1)
+
+
+def from_microseconds(microseconds: int) -> datetime:
+    return EPOCH + timedelta(microseconds=microseconds)
+
+
+MONTHS = {name: index for index, name in enumerate(
+    ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'), 1)}
+
+# date part ('01 Nov 2019') of the last timestamp parsed, and its epoch microseconds: consecutive records share
+# the same day
+_last_day = ('', None)
+# part up to the seconds ('01 Nov 2019, 10:20:30') of the last timestamp parsed, its datetime and epoch
+# microseconds: records come in bursts within the same second
+_last_second = ('', None, None)
+_MILLISECONDS = [timedelta(milliseconds=milliseconds) for milliseconds in range(1000)]
+
+
+def _day_micros(text: str) -> int:
+    global _last_day
+    last_day = _last_day  # read once: other threads may replace it
+    key = text[:11]
+    if last_day[0] != key:
+        last_day = _last_day = (key, to_microseconds(datetime(int(text[7:11]), MONTHS[text[3:6]], int(text[:2]))))
+    return last_day[1]
+
+
+def _second(text: str):
+    """datetime and epoch microseconds of the timestamp truncated to the second, ValueError if invalid"""
+    global _last_second
+    last_second = _last_second  # read once: other threads may replace it
+    key = text[:21]
+    if last_second[0] != key:
+        hour, minute, second = int(text[13:15]), int(text[16:18]), int(text[19:21])
+        if not (hour < 24 and minute < 60 and second < 60):
+            raise ValueError(text)
+        micros = _day_micros(text) + ((hour * 60 + minute) * 60 + second) * 1000000
+        last_second = _last_second = (key, from_microseconds(micros), micros)
+    return last_second
+
+
+def _fixed_layout(text: str) -> bool:
+    """
+    whether text is laid out as LogRecord.TIME_FMT with milliseconds, e.g. '01 Nov 2019, 10:20:30.123', with only
+    digits between the separators (int() accepts more than strptime, e.g. '+1' or ' 1')
+    """
+    return len(text) == 25 and text[2] == ' ' and text[6] == ' ' and text[11:13] == ', ' and text[15] == ':' \
+        and text[18] == ':' and text[21] == '.' \
+        and (text[:2] + text[7:11] + text[13:15] + text[16:18] + text[19:21] + text[22:]).isdigit()
+
+
+def parse_timestamp(text: str) -> datetime:
+    """
+    datetime.strptime(text, LogRecord.TIME_FMT), with a fast path for the layout of the log lines
+    """
+    if _fixed_layout(text):
+        try:
+            return _second(text)[1] + _MILLISECONDS[int(text[22:25])]
+        except (KeyError, ValueError):
+            pass
+    return datetime.strptime(text, LogRecord.TIME_FMT)
+
+
+def parse_timestamp_micros(text: str) -> int:
+    """
+    parse_timestamp(text) as microseconds since epoch
+    """
+    if _fixed_layout(text):
+        try:
+            return _second(text)[2] + int(text[22:25]) * 1000
+        except (KeyError, ValueError):
+            pass
+    return to_microseconds(datetime.strptime(text, LogRecord.TIME_FMT))
+
+
+class LogIndex:
+    """
+    On-disk index of a log file: byte offset, timestamp, severity and pid of each record in compact arrays,
+    saved next to the file (path + SUFFIX) and reused while the size and mtime of the file are unchanged.
+    The index file holds a JSON header line followed by the raw bytes of the arrays, in ARRAYS order.
+    where() searches the arrays, and only the text of the matching records is read from the file.
+    Lines are expected to end with \n or \r\n
+    """
+    SUFFIX = '.logidx'
+    VERSION = 2
+    ARRAYS = ('offsets', 'timestamps', 'severities', 'pids')
+    ENCODING = locale.getpreferredencoding(False)
+
+    def __init__(self, filepath: str, key, offsets, timestamps, severities, severity_names, pids, time_sorted):
+        """
+        use open() instead
+        :param offsets: array of the byte offsets of the records, plus the end of the last one
+        :param timestamps: array of microseconds since epoch
+        :param severities: array of indexes in severity_names
+        :param time_sorted: whether the timestamps are in order, to binary search them
+        """
+        self.filepath = filepath
+        self.key = key
+        self.offsets = offsets
+        self.timestamps = timestamps
+        self.severities = severities
+        self.severity_names = severity_names
+        self.pids = pids
+        self.time_sorted = time_sorted
+
+    @staticmethod
+    def _file_key(filepath: str):
+        stat = os.stat(filepath)
+        return LogIndex.VERSION, stat.st_size, stat.st_mtime_ns
+
+    @classmethod
+    def open(cls, filepath: str):
+        """
+        load the index of the log file, building (and saving) it if missing or out of date
+        :param filepath: log file
+        :return: LogIndex
+        """
+        key = cls._file_key(filepath)
+        try:
+            state = cls._load(filepath + cls.SUFFIX, key)
+        except (OSError, ValueError, KeyError, TypeError):
+            state = None
+        return cls(filepath, **state) if state else cls.build(filepath)
+
+    @classmethod
+    def _load(cls, index_path: str, key):
+        """state saved by _save, None if saved for another key"""
+        with open(index_path, 'rb') as file:
+            header = json.loads(file.readline())
+            if tuple(header['key']) != key:
+                return None
+            state = dict(key=key, severity_names=header['severity_names'], time_sorted=header['time_sorted'])
+            for name in cls.ARRAYS:
+                typecode, length = header['arrays'][name]
+                values = array(typecode)
+                values.frombytes(file.read(length * values.itemsize))
+                if len(values) != length:
+                    raise ValueError('truncated index file')
+                if header['byteorder'] != sys.byteorder:
+                    values.byteswap()
+                state[name] = values
+        return state
+
+    @classmethod
+    def _save(cls, index_path: str, state):
+        """save the state to a temporary file renamed to index_path, so that readers never see a partial one"""
+        header = dict(key=state['key'], severity_names=state['severity_names'], time_sorted=state['time_sorted'],
+                      byteorder=sys.byteorder,
+                      arrays={name: (state[name].typecode, len(state[name])) for name in cls.ARRAYS})
+        temp_path = '{}.{}.tmp'.format(index_path, os.getpid())
+        try:
+            with open(temp_path, 'wb') as file:
+                file.write(json.dumps(header).encode('ascii') + b'\n')
+                for name in cls.ARRAYS:
+                    state[name].tofile(file)
+            os.replace(temp_path, index_path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    @classmethod
+    def build(cls, filepath: str):
+        """
+        scan the log file and save its index
+        :param filepath: log file
+        :return: LogIndex
+        """
+        key = cls._file_key(filepath)
+        offsets, timestamps, severities, pids = array('q'), array('q'), array('B'), array('q')
+        severity_codes = {}
+        offset = 0
+        with open(filepath, 'rb') as file:
+            for line in file:
+                m = RecordSet.LOG_PATTERN.match(line.decode(cls.ENCODING, errors='ignore').strip())
+                if m:
+                    offsets.append(offset)
+                    timestamps.append(parse_timestamp_micros(m.group(1)))
+                    severities.append(severity_codes.setdefault(m.group(2), len(severity_codes)))
+                    pids.append(int(m.group(3)))
+                offset += len(line)
+        offsets.append(offset)
+        state = dict(key=key, offsets=offsets, timestamps=timestamps, severities=severities,
+                     severity_names=list(severity_codes), pids=pids,
+                     time_sorted=all(a <= b for a, b in zip(timestamps, timestamps[1:])))
+        try:
+            cls._save(filepath + cls.SUFFIX, state)
+        except OSError:  # read-only directory: the index is kept in memory only
+            pass
+        return cls(filepath, **state)
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def where(self, time_range: str = None, severity: str = None, pid: int = None):
+        """
+        positions of the records matching all the criteria, like RecordSet.where
+        :param time_range: 'start,end' as in TimeRangePredicate, both exclusive
+        :param severity: severity name
+        :param pid: process id
+        :return: list of positions (seq)
+        """
+        start, end = 0, len(self)
+        low = high = None
+        if time_range:
+            predicate = TimeRangePredicate(time_range)
+            low = to_microseconds(predicate.start) if predicate.start else None
+            high = to_microseconds(predicate.end) if predicate.end else None
+            if self.time_sorted:
+                start = bisect_right(self.timestamps, low) if low is not None else 0
+                end = bisect_left(self.timestamps, high) if high is not None else len(self)
+                low = high = None
+        code = None
+        if severity is not None:
+            if severity not in self.severity_names:
+                return []
+            code = self.severity_names.index(severity)
+
+        positions = range(start, end)
+        if low is not None:
+            positions = [i for i in positions if self.timestamps[i] > low]
+        if high is not None:
+            positions = [i for i in positions if self.timestamps[i] < high]
+        if code is not None:
+            severities = self.severities
+            positions = [i for i in positions if severities[i] == code]
+        if pid is not None:
+            pids = self.pids
+            positions = [i for i in positions if pids[i] == pid]
+        return list(positions)
+
+    def read(self, positions, epoch_micros: bool = False):
+        """
+        read the records at the positions from the log file
+        :param positions: iterable of positions, as returned by where()
+        :param epoch_micros: keep the timestamps as microseconds since epoch instead of datetime
+        :return: list of LogRecord
+        """
+        records = []
+        with open(self.filepath, 'rb') as file:
+            for i in positions:
+                file.seek(self.offsets[i])
+                text = file.read(self.offsets[i + 1] - self.offsets[i]).decode(self.ENCODING, errors='ignore')
+                lines = [line.strip() for line in text.split('\n')]
+                original = '\n'.join([RecordSet.LOG_PATTERN.match(lines[0]).group(4)] +
+                                     [line for line in lines[1:] if line])
+                timestamp = self.timestamps[i]
+                records.append(LogRecord(i, timestamp if epoch_micros else from_microseconds(timestamp),
+                                         self.severity_names[self.severities[i]], self.pids[i], original))
+        return records
+
+
+def _parse_lines(lines, epoch_micros: bool = False):
+    """
+    parse log lines like RecordSet.load_file, the lines before the first record being ignored
+    :param lines: iterable of str
+    :param epoch_micros: parse the timestamps as microseconds since epoch instead of datetime
+    :return: list of (timestamp, severity, pid, original)
+    """
+    parse = parse_timestamp_micros if epoch_micros else parse_timestamp
+    parsed = []
+    record = None
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        m = RecordSet.LOG_PATTERN.match(line)
+        if not m:  # continue line
+            if record:
+                record[3].append(line)
+            continue
+
+        timestamp = parse(m.group(1))
+        record = (timestamp, m.group(2), int(m.group(3)), [m.group(4)])
+        parsed.append(record)
+    return [(timestamp, severity, pid, '\n'.join(original)) for timestamp, severity, pid, original in parsed]
+
+
+# smallest chunk of a log file parsed by one worker
+MIN_CHUNK_SIZE = 1 << 20
+
+
+def _chunk_starts(filepath: str, chunk_count: int):
+    """byte offsets splitting the file into chunk_count chunks at record start lines"""
+    size = os.path.getsize(filepath)
+    chunk_count = max(1, min(chunk_count, size // MIN_CHUNK_SIZE))
+    starts = [0]
+    with open(filepath, 'rb') as file:
+        for index in range(1, chunk_count):
+            offset = max(size * index // chunk_count, starts[-1])
+            file.seek(offset)
+            if offset:
+                offset += len(file.readline())  # the end of a line
+            for line in iter(file.readline, b''):
+                if RecordSet.LOG_PATTERN.match(line.decode(LogIndex.ENCODING, errors='ignore').strip()):
+                    break
+                offset += len(line)
+            if offset > starts[-1]:
+                starts.append(offset)
+    return starts + [size]
+
+
+def _parse_chunk(filepath: str, start: int, end: int, epoch_micros: bool):
+    with open(filepath, 'rb') as file:
+        file.seek(start)
+        data = file.read(end - start)
+    return _parse_lines(io.TextIOWrapper(io.BytesIO(data), encoding=LogIndex.ENCODING, errors='ignore'),
+                        epoch_micros)
+
+
+def _submit_chunks(pool, filepath: str, workers: int, epoch_micros: bool):
+    starts = _chunk_starts(filepath, workers * 4)
+    return [pool.submit(_parse_chunk, filepath, start, end, epoch_micros) for start, end in zip(starts, starts[1:])]
+
+
+def _parse_file_parallel(pool, filepath: str, workers: int, epoch_micros: bool):
+    return [fields for future in _submit_chunks(pool, filepath, workers, epoch_micros) for fields in future.result()]
+
+
 class RecordSet(UserList):
     """Set of log records, with particular columns"""
     LOG_PATTERN = re.compile(r'^(\d{2} \w{3} \d{4}, \d{2}:\d{2}:\d{2}\.\d{3}): (\w+) +: \[(\d+)\] : (.+)$')
@@ -97,40 +438,93 @@ class RecordSet(UserList):
         self.instance = instance
 
     @classmethod
-    def from_file(cls, filepath: str):
+    def from_file(cls, filepath: str, epoch_micros: bool = False, **kwargs):
         """
         Create instance from one log file
         :param filepath: file path to load
+        :param epoch_micros: keep the timestamps as microseconds since epoch (int) instead of datetime
+        :param kwargs: criteria of where(), to load the matching records only: time_range, severity and pid are
+            searched in the index of the file (see LogIndex), the others applied to the records read
         :return: list of log records
         """
-        instance = os.path.basename(filepath).split('_')[3]
-        records = cls(instance)
-        records.load_file(filepath)
-        return records
+        records = cls._for_file(filepath, epoch_micros)
+        if not kwargs:
+            records.load_file(filepath, epoch_micros=epoch_micros)
+            return records
+
+        index = LogIndex.open(filepath)
+        indexed = {k: kwargs.pop(k) for k in ('time_range', 'severity', 'pid') if k in kwargs}
+        records.extend(index.read(index.where(**indexed), epoch_micros))
+        return records.where(**kwargs) if kwargs else records
 
-    def load_file(self, filepath: str):
+    def load_file(self, filepath: str, workers: int = None, epoch_micros: bool = False):
         """
         load log file into current record set
         :param filepath: file path to load
+        :param workers: number of processes parsing chunks of the file in parallel, see load_files
+        :param epoch_micros: keep the timestamps as microseconds since epoch (int) instead of datetime
         :return: None
         """
-        count = len(self)
-        with open(filepath, errors='ignore') as file:
-            record = None
-            for line in file:
-                line = line.strip()
-                if not line:
-                    continue
-                m = RecordSet.LOG_PATTERN.match(line)
-                if not m:  # continue line
-                    if record:
-                        record.original = '\n'.join((record.original, line))
-                    continue
-
-                timestamp = datetime.strptime(m.group(1), LogRecord.TIME_FMT)
-                record = LogRecord(count, timestamp, m.group(2), int(m.group(3)), m.group(4))
-                count += 1
-                self.append(record)
+        if workers and workers > 1:
+            with ProcessPoolExecutor(workers) as pool:
+                parsed = _parse_file_parallel(pool, filepath, workers, epoch_micros)
+        else:
+            with open(filepath, errors='ignore') as file:
+                parsed = _parse_lines(file, epoch_micros)
+        self._extend_parsed(len(self), parsed)
+
+    @classmethod
+    def _for_file(cls, filepath: str, epoch_micros: bool):
+        """empty record set for the records of the log file"""
+        return cls(os.path.basename(filepath).split('_')[3])
+
+    def _extend_parsed(self, seq: int, parsed):
+        """append the records parsed by _parse_lines, numbered from seq"""
+        self.extend(LogRecord(seq + i, *fields) for i, fields in enumerate(parsed))
+
+    def _empty(self):
+        """empty record set of the same kind, for the results"""
+        return self.__class__(self.instance)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):  # UserList would call cls(records), the records taken for the instance
+            result = self._empty()
+            result.data = self.data[index]
+            return result
+        return self.data[index]
+
+    @classmethod
+    def load_files(cls, filepaths, workers: int = None, epoch_micros: bool = False):
+        """
+        load many log files at once, split in chunks at record boundaries parsed in a process pool
+        :param filepaths: log files
+        :param workers: number of processes, by default the number of cores
+        :param epoch_micros: keep the timestamps as microseconds since epoch (int) instead of datetime
+        :return: RecordSet of the records of all the files in timestamp order (stable: records of the same timestamp
+            stay in file order), each numbered (seq) as from_file numbers it, instance being the instances of the
+            files joined with ','. The files in timestamp order are merged, else all the records are sorted
+        """
+        filepaths = list(filepaths)
+        workers = workers or os.cpu_count() or 1
+        record_sets = [cls._for_file(filepath, epoch_micros) for filepath in filepaths]
+        with ProcessPoolExecutor(workers) as pool:
+            pending = [_submit_chunks(pool, filepath, workers, epoch_micros) for filepath in filepaths]
+            for records, futures in zip(record_sets, pending):
+                records._extend_parsed(0, (fields for future in futures for fields in future.result()))
+
+        result = record_sets[0]._empty() if record_sets else cls('')
+        result.instance = ','.join(records.instance for records in record_sets)
+        timestamp = lambda record: record.props.timestamp
+        if all(records._time_sorted() for records in record_sets):
+            result.extend(heapq.merge(*record_sets, key=timestamp))
+        else:
+            result.extend(sorted(chain.from_iterable(record_sets), key=timestamp))
+        return result
+
+    def _time_sorted(self):
+        """whether the records are in timestamp order"""
+        timestamps = [record.props.timestamp for record in self]
+        return all(a <= b for a, b in zip(timestamps, timestamps[1:]))
 
     def where(self, **kwargs):
         """
@@ -140,7 +534,7 @@ class RecordSet(UserList):
         """
         _filter = Filter(**kwargs)
 
-        results = RecordSet(self.instance)
+        results = self._empty()
         for rec in self:
             if _filter(rec):
                 results.append(rec)
@@ -220,7 +614,7 @@ class RecordSet(UserList):
     def __add__(self, other):
         """merge 2 record set in time order"""
         assert isinstance(other, RecordSet)
-        ret = RecordSet(self.instance)
+        ret = self._empty()
 
         index = 0
         for rec in self:
@@ -234,3 +628,155 @@ class RecordSet(UserList):
             index += 1
 
         return ret
+
+
+class RecordColumns(MutableSequence):
+    """
+    Log records stored column by column: seq, timestamp (epoch microseconds) and pid in arrays, severity as codes
+    of interned names, and the texts in one UTF-8 buffer delimited by offsets. Records are LogRecord when read
+    """
+    def __init__(self, epoch_micros: bool = False):
+        """
+        :param epoch_micros: read the timestamps as microseconds since epoch (int) instead of datetime
+        """
+        self.epoch_micros = epoch_micros
+        self.seqs = array('q')
+        self.timestamps = array('q')
+        self.pids = array('q')
+        self.severities = array('H')
+        self.severity_names = []
+        self._severity_codes = {}
+        self.text = bytearray()
+        self.text_offsets = array('q', [0])
+
+    def append_fields(self, seq: int, timestamp, severity: str, pid: int, original: str):
+        """append one record, timestamp being a datetime or epoch microseconds"""
+        self.seqs.append(seq)
+        self.timestamps.append(timestamp if isinstance(timestamp, int) else to_microseconds(timestamp))
+        code = self._severity_codes.get(severity)
+        if code is None:
+            code = self._severity_codes[severity] = len(self.severity_names)
+            self.severity_names.append(severity)
+        self.severities.append(code)
+        self.pids.append(pid)
+        self.text += original.encode('utf-8', 'surrogatepass')
+        self.text_offsets.append(len(self.text))
+
+    def append(self, record: LogRecord):
+        self.append_fields(*record.props, record.original)
+
+    def extend(self, records):
+        if records is self:
+            records = list(records)
+        for record in records:
+            self.append(record)
+
+    def original(self, index: int) -> str:
+        return self.text[self.text_offsets[index]:self.text_offsets[index + 1]].decode('utf-8', 'surrogatepass')
+
+    def __len__(self):
+        return len(self.seqs)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            columns = RecordColumns(self.epoch_micros)
+            for i in range(*index.indices(len(self))):
+                columns.append(self[i])
+            return columns
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('record index out of range')
+        timestamp = self.timestamps[index]
+        return LogRecord(self.seqs[index], timestamp if self.epoch_micros else from_microseconds(timestamp),
+                         self.severity_names[self.severities[index]], self.pids[index], self.original(index))
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def __setitem__(self, index, record):
+        raise TypeError('RecordColumns only support appending')
+
+    def __delitem__(self, index):
+        raise TypeError('RecordColumns only support appending')
+
+    def insert(self, index, record):
+        if index < len(self):
+            raise TypeError('RecordColumns only support appending')
+        self.append(record)
+
+    def nbytes(self) -> int:
+        """memory held by the columns"""
+        arrays = (self.seqs, self.timestamps, self.pids, self.severities, self.text_offsets)
+        return sum(column.itemsize * len(column) for column in arrays) + len(self.text)
+
+
+class CompactRecordSet(RecordSet):
+    """
+    RecordSet holding its records in RecordColumns instead of LogRecord objects, with the same API
+    Records are built when read; where() searches severity, pid and time_range in the columns
+    """
+    def __init__(self, instance, data=None, epoch_micros: bool = False):
+        """
+        :param instance: calc name
+        :param data: existent log records
+        :param epoch_micros: read the timestamps as microseconds since epoch (int) instead of datetime
+        """
+        super().__init__(instance)
+        self.data = RecordColumns(epoch_micros)
+        if data:
+            self.data.extend(data)
+
+    @classmethod
+    def _for_file(cls, filepath: str, epoch_micros: bool):
+        return cls(os.path.basename(filepath).split('_')[3], epoch_micros=epoch_micros)
+
+    def _empty(self):
+        return self.__class__(self.instance, epoch_micros=self.data.epoch_micros)
+
+    def _extend_parsed(self, seq: int, parsed):
+        for i, fields in enumerate(parsed):
+            self.data.append_fields(seq + i, *fields)
+
+    def _time_sorted(self):
+        timestamps = self.data.timestamps
+        return all(a <= b for a, b in zip(timestamps, timestamps[1:]))
+
+    def load_file(self, filepath: str, workers: int = None, epoch_micros: bool = False):
+        """
+        load log file into current record set, see RecordSet.load_file
+        the timestamps are read as datetime or epoch microseconds as given when creating the record set
+        """
+        super().load_file(filepath, workers, epoch_micros=True)  # stored as epoch microseconds anyway
+
+    def where(self, **kwargs):
+        """
+        filter current record set by criteria, see RecordSet.where
+        """
+        columns = self.data
+        positions = range(len(columns))
+        if 'time_range' in kwargs:
+            predicate = TimeRangePredicate(kwargs.pop('time_range'))
+            timestamps = columns.timestamps
+            if predicate.start:
+                low = to_microseconds(predicate.start)
+                positions = [i for i in positions if timestamps[i] > low]
+            if predicate.end:
+                high = to_microseconds(predicate.end)
+                positions = [i for i in positions if timestamps[i] < high]
+        if 'severity' in kwargs:
+            severity = kwargs.pop('severity')
+            code = columns.severity_names.index(severity) if severity in columns.severity_names else None
+            positions = [i for i in positions if columns.severities[i] == code]
+        if 'pid' in kwargs:
+            pid = kwargs.pop('pid')
+            positions = [i for i in positions if columns.pids[i] == pid]
+
+        _filter = Filter(**kwargs)
+        results = self._empty()
+        for i in positions:
+            record = columns[i]
+            if _filter(record):
+                results.data.append(record)
+        return results
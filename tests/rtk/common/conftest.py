@@ -0,0 +1,40 @@
+import pytest
+
+from rtk.common.csvutil import RecordParserBase
+
+
+class UpperCaseParser(RecordParserBase):
+    def __init__(self):
+        super().__init__(records=0, sections=0)
+
+    def process_record(self, record, col_lookup):
+        self.records += 1
+        index = col_lookup['Name']
+        record[index] = record[index].upper()
+
+    def section_done(self):
+        self.sections += 1
+
+    def merge(self, other):
+        self.records += other.records
+        self.sections += other.sections
+
+
+def _write_sections(path, sections=3, rows=20):
+    with open(path, 'w') as file:
+        for section in range(sections):
+            file.write('Section {},Name,Value\n'.format(section))
+            for row in range(rows):
+                file.write(',name {}-{},"{}, {}"\n'.format(section, row, row, row + 1))
+
+
+@pytest.fixture
+def upper_case_parser():
+    """a record parser class upper-casing the Name column, counting the records and sections"""
+    return UpperCaseParser
+
+
+@pytest.fixture
+def write_sections():
+    """a function writing a csv of `sections` sections of `rows` records each, with a quoted Value column"""
+    return _write_sections
@@ -0,0 +1,118 @@
+from datetime import date
+
+import pytest
+
+from rtk.common.base import MapperBase
+from rtk.common.columnar import ColumnBuilder, RecordBatch, _to_python_list
+from rtk.common.meta import Field, FieldType
+
+
+class Trade(MapperBase):
+    trade_id = Field(name='id')
+    quantity = Field(type_=FieldType.Integer)
+    price = Field(type_=FieldType.Float)
+    trade_date = Field(type_=FieldType.Date)
+    settled = Field(type_=FieldType.Boolean)
+
+
+def make_trades(count):
+    return [Trade(trade_id='T%d' % i, quantity=i, price=i / 2, trade_date=date(2019, 11, i % 28 + 1),
+                  settled=i % 2 == 0) for i in range(count)]
+
+
+def test_round_trip():
+    rows = Trade.generate_many(make_trades(5))
+    batch = RecordBatch.from_dicts(Trade, rows)
+    assert len(batch) == 5
+    assert batch.types['trade_id'] is None
+    assert batch.types['quantity'] is FieldType.Integer
+    assert batch.to_dicts() == rows
+    assert batch.values('trade_date')[2] == date(2019, 11, 3)
+
+
+def test_row_view_and_projection():
+    trades = make_trades(4)
+    batch = RecordBatch.from_instances(Trade, trades)
+    view = batch[-1]
+    assert (view.trade_id, view.quantity, view.price) == ('T3', 3, 1.5)
+    assert view.settled == trades[-1].settled
+    assert view['id'] == 'T3'
+    assert view.generate() == trades[-1].generate()
+    assert view.materialise().trade_date == date(2019, 11, 4)
+
+    projected = batch[1:3].select('quantity', 'trade_date')
+    assert projected.to_dicts() == [{'quantity': 1, 'trade_date': '2019-11-02'},
+                                    {'quantity': 2, 'trade_date': '2019-11-03'}]
+    assert dict(projected[0].items()) == {'quantity': 1, 'trade_date': '2019-11-02'}
+
+
+def test_booleans():
+    rows = [{'settled': True}, {'settled': False}]
+    batch = RecordBatch.from_dicts(Trade, rows)
+    assert batch.types['settled'] is FieldType.Boolean
+    assert batch.values('settled') == [True, False]
+    assert [view.settled for view in batch] == [Trade.build_from(row).settled for row in rows]
+    assert batch.to_dicts()[1]['settled'] is False
+    assert batch[1]['settled'] is False
+
+    # other raw values are read by the field converter, like mapper instances read them
+    rows = [{'settled': 'True'}, {'settled': 'False'}, {'settled': 'yes'}, {'settled': ''}]
+    batch = RecordBatch.from_dicts(Trade, rows)
+    assert batch.types['settled'] is None
+    assert batch.values('settled') == [view.settled for view in batch] == \
+        [Trade.build_from(row).settled for row in rows] == [True, True, True, False]
+    assert batch.to_dicts() == [dict(row, id=None, quantity=None, price=None, trade_date=None) for row in rows]
+
+
+def test_unconvertible_values_fall_back_to_raw_list():
+    rows = [{'quantity': 12345678901234567890}, {'quantity': 1}]
+    batch = RecordBatch.from_dicts(Trade, rows)
+    assert batch.types['quantity'] is None
+    assert batch.values('quantity') == [12345678901234567890, 1]
+    batch = RecordBatch.from_dicts(Trade, [{'quantity': 'abc', 'price': 'n/a'}])
+    assert (batch.types['quantity'], batch.types['price']) == (None, None)
+    assert batch.to_dicts()[0]['quantity'] == 'abc'
+    with pytest.raises(ValueError):
+        batch.values('quantity')  # as Trade.build_from(...).quantity raises
+    assert Trade.build_from({'settled': 'true'}).settled is True
+
+
+def test_missing_values_fall_back_to_raw_list():
+    batch = RecordBatch.from_dicts(Trade, [{'id': 'T1', 'quantity': 1}, {'id': 'T2'}])
+    assert batch.types['quantity'] is None
+    assert batch.values('quantity') == [1, 0]
+    assert batch.to_dicts()[1] == {'id': 'T2', 'quantity': None, 'price': None, 'trade_date': None,
+                                   'settled': None}
+
+
+def test_column_builder():
+    builder = ColumnBuilder('quantity', infer=True)
+    builder.append(('1', '2'))
+    assert builder.field_type is FieldType.Integer
+    builder.append(('3',))
+    assert list(builder.column()) == [1, 2, 3]
+    builder.append(('n/a',))  # read again as str
+    assert (builder.field_type, builder.column()) == (None, ['1', '2', '3', 'n/a'])
+
+    # demoted columns keep the text read
+    builder = ColumnBuilder('price', infer=True)
+    builder.append(('007', '1.50'))
+    assert builder.field_type is FieldType.Float
+    builder.append(('n/a',))
+    assert builder.column() == ['007', '1.50', 'n/a']
+
+    # integers beyond int64 are not Integer
+    builder = ColumnBuilder('id', infer=True)
+    builder.append(('12345678901234567890', '1'))
+    assert (builder.field_type, builder.column()) == (None, ['12345678901234567890', '1'])
+    builder = ColumnBuilder('id', infer=True)
+    builder.append(('1', '2'))
+    builder.append(('12345678901234567890',))
+    assert (builder.field_type, builder.column()) == (None, ['1', '2', '12345678901234567890'])
+
+    builder = ColumnBuilder('trade_date', FieldType.Date, date_format='%Y/%m/%d')
+    builder.append(('2019/11/01', '2019/11/02', '2019/11/01'))
+    assert _to_python_list(FieldType.Date, builder.column()) == [date(2019, 11, 1), date(2019, 11, 2),
+                                                                 date(2019, 11, 1)]
+    with pytest.raises(ValueError, match='trade_date'):
+        builder.append(('',))
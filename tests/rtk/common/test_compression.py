@@ -0,0 +1,50 @@
+import bz2
+import gzip
+import lzma
+
+import pytest
+
+from rtk.common.compression import ThreadedReader, compression_of, open_file
+
+
+@pytest.mark.parametrize('extension, module', [('.gz', gzip), ('.bz2', bz2), ('.xz', lzma)])
+def test_open_file(tmp_path, extension, module):
+    text = ''.join('line {}\n'.format(index) for index in range(1000))
+    path = tmp_path / ('out' + extension)
+    with open_file(path, 'w') as file:
+        file.write(text)
+    assert module.decompress(path.read_bytes()).decode() == text
+
+    renamed = path.rename(tmp_path / 'renamed')  # read by magic bytes
+    assert compression_of(renamed).name == compression_of(path, 'w').name
+    with open_file(renamed) as file:
+        assert file.read() == text
+
+
+def test_open_file_plain(tmp_path):
+    path = tmp_path / 'plain.csv'
+    path.write_text('a,b\n')
+    assert compression_of(path) is None
+    with open_file(path) as file:
+        assert file.read() == 'a,b\n'
+
+
+def test_threaded_reader():
+    class Failing:
+        def __init__(self):
+            self.blocks = [b'abc', b'def']
+
+        def read(self, size):
+            if not self.blocks:
+                raise OSError('truncated')
+            return self.blocks.pop(0)
+
+        def close(self):
+            pass
+
+    reader = ThreadedReader(Failing(), buffer_blocks=1)
+    buffer = bytearray(2)
+    assert [reader.readinto(buffer) for _ in range(4)] == [2, 1, 2, 1]
+    with pytest.raises(OSError, match='truncated'):
+        reader.readinto(buffer)
+    reader.close()
@@ -0,0 +1,187 @@
+import gzip
+import lzma
+
+import pytest
+
+from rtk.common.csvutil import (SECTION_INDEX_SUFFIX, ColumnPredicate, RecordParserBase, load_sections, plan_chunks,
+                                process_csv, section_index)
+from rtk.common.meta import FieldType
+
+
+def test_process_csv(tmp_path, upper_case_parser, write_sections):
+    input_path, output_path = tmp_path / 'in.csv', tmp_path / 'out.csv'
+    write_sections(input_path, sections=1, rows=3)
+    parser = upper_case_parser()
+    process_csv(input_path, output_file_path=output_path, record_parser=parser)
+    assert output_path.read_text().splitlines() == ['Section 0,Name,Value', ',NAME 0-0,"0, 1"', ',NAME 0-1,"1, 2"',
+                                                    ',NAME 0-2,"2, 3"']
+    assert (parser.records, parser.sections) == (3, 1)
+
+
+def test_plan_chunks(tmp_path, write_sections):
+    path = tmp_path / 'in.csv'
+    write_sections(path, sections=2, rows=10)
+    chunks, sections = plan_chunks(path, 4)
+    assert sections == 2
+    assert chunks[0].start == 0 and chunks[-1].end == path.stat().st_size
+    assert all(a.end == b.start for a, b in zip(chunks, chunks[1:]))
+    assert chunks[1].header_start == 0
+
+
+def test_process_csv_parallel(tmp_path, upper_case_parser, write_sections):
+    input_path = tmp_path / 'in.csv'
+    write_sections(input_path)
+    serial, parallel = upper_case_parser(), upper_case_parser()
+    process_csv(input_path, output_file_path=tmp_path / 'serial.csv', record_parser=serial, multiple_header=True)
+    process_csv(input_path, output_file_path=tmp_path / 'parallel.csv', record_parser=parallel,
+                multiple_header=True, workers=2)
+    assert (tmp_path / 'parallel.csv').read_text() == (tmp_path / 'serial.csv').read_text()
+    assert (parallel.records, parallel.sections) == (serial.records, serial.sections) == (60, 3)
+
+
+class RenameParser(RecordParserBase):
+    """rename a few records, reading the Name column only"""
+    def __init__(self):
+        super().__init__(seen=[])
+
+    def process_record(self, record, col_lookup):
+        self.seen.append(list(record))
+        index = col_lookup['Name']
+        if record[index].endswith('-1'):
+            record[index] = 'renamed, ' + record[index]
+
+
+def test_process_csv_projected(tmp_path, write_sections):
+    input_path = tmp_path / 'in.csv'
+    write_sections(input_path, sections=2, rows=3)
+    with open(input_path, 'a') as file:
+        file.write(',plain,7\n"",quoted "a",1\n')
+    parser = RenameParser()
+    process_csv(input_path, output_file_path=tmp_path / 'out.csv', record_parser=parser,
+                multiple_header=True, columns=('Name',))
+    assert parser.seen[-2:] == [[None, 'plain', None], ['', 'quoted "a"', '1']]
+    lines = (tmp_path / 'out.csv').read_text().splitlines()
+    assert lines[:4] == ['Section 0,Name,Value', ',name 0-0,"0, 1"', ',"renamed, name 0-1","1, 2"', ',name 0-2,"2, 3"']
+    assert lines[-1] == '"",quoted "a",1'
+
+    # RenameParser gathers records without merging them: run serially, keeping them all
+    parallel = RenameParser()
+    process_csv(input_path, output_file_path=tmp_path / 'parallel.csv', record_parser=parallel,
+                multiple_header=True, columns=('Name',), workers=2)
+    assert (tmp_path / 'parallel.csv').read_text().splitlines() == lines
+    assert parallel.seen == parser.seen
+
+
+def test_process_csv_keeps_line_terminators(tmp_path):
+    input_path = tmp_path / 'in.csv'
+    input_path.write_bytes(b'Section,Name,Value\r\n,a-1,"1, 2"\r\n"",b-1,2\r\n,c,3\r\n,d-1,4')
+    process_csv(input_path, output_file_path=tmp_path / 'out.csv', record_parser=RenameParser(),
+                columns=('Name',))
+    # spliced, decoded again (quoted first column) and unchanged records
+    assert (tmp_path / 'out.csv').read_bytes() == (b'Section,Name,Value\r\n,"renamed, a-1","1, 2"\r\n'
+                                                   b',"renamed, b-1",2\r\n,c,3\r\n,"renamed, d-1",4')
+
+
+class SelectiveParser(RenameParser):
+    """rename the records of the first rows only, declaring its columns and predicate"""
+    columns = ('Name',)
+    predicate = ColumnPredicate('Value', lambda value: value[0] in '01')
+
+
+def test_process_csv_predicate(tmp_path, write_sections):
+    input_path = tmp_path / 'in.csv'
+    write_sections(input_path, sections=2, rows=3)
+    with open(input_path, 'a') as file:
+        file.write('"",quoted "a-1",1\nOther,Name\n,b-1\n')
+    parser = SelectiveParser()
+    process_csv(input_path, output_file_path=tmp_path / 'out.csv', record_parser=parser, multiple_header=True)
+    # quoted Value needs decoding the record, and records of the section without Value are all processed
+    assert parser.seen == [['', 'name 0-0', '0, 1'], ['', 'name 0-1', '1, 2'], ['', 'name 1-0', '0, 1'],
+                           ['', 'name 1-1', '1, 2'], ['', 'quoted "a-1"', '1'], [None, 'b-1']]
+    lines = (tmp_path / 'out.csv').read_text().splitlines()
+    assert lines[2:4] == [',"renamed, name 0-1","1, 2"', ',name 0-2,"2, 3"']
+    assert lines[-3:] == ['"",quoted "a-1",1', 'Other,Name', ',"renamed, b-1"']
+
+    process_csv(input_path, output_file_path=tmp_path / 'parallel.csv', record_parser=SelectiveParser(),
+                multiple_header=True, workers=2)
+    assert (tmp_path / 'parallel.csv').read_text().splitlines() == lines
+
+
+def test_process_csv_compressed(tmp_path, upper_case_parser, write_sections):
+    input_path = tmp_path / 'in.csv'
+    write_sections(input_path)
+    process_csv(input_path, output_file_path=tmp_path / 'expected.csv', record_parser=upper_case_parser(),
+                multiple_header=True)
+    expected = (tmp_path / 'expected.csv').read_text()
+    compressed_path = tmp_path / 'in.csv.gz'
+    compressed_path.write_bytes(gzip.compress(input_path.read_bytes()))
+    for options in ({}, {'columns': ('Name',)}, {'workers': 2}):
+        parser = upper_case_parser()
+        process_csv(compressed_path, output_file_path=tmp_path / 'out.csv.xz', record_parser=parser,
+                    multiple_header=True, **options)
+        assert lzma.decompress((tmp_path / 'out.csv.xz').read_bytes()).decode() == expected
+        assert parser.records == 60
+
+
+def test_load_sections(tmp_path, write_sections):
+    path = tmp_path / 'in.csv'
+    write_sections(path, sections=2, rows=5)
+    with open(path, 'a') as file:
+        file.write('Prices,Price,Live\n,1.5,True\n,,False\n,2\n')
+    sections = list(load_sections(path, {'Price': FieldType.Float}, infer=True, chunk_rows=2))
+    assert [header[0] for header, columns in sections] == ['Section 0', 'Section 1', 'Prices']
+    assert sections[1].columns['Name'] == ['name 1-{}'.format(row) for row in range(5)]
+    prices = sections[2].columns
+    assert list(prices['Price'][:1]) == [1.5] and prices['Price'][1] != prices['Price'][1]  # NaN
+    assert prices['Live'] == ['True', 'False', '']  # the missing value keeps Live as str
+
+
+def test_section_index(tmp_path, write_sections):
+    path = tmp_path / 'in.csv'
+    write_sections(path, sections=3, rows=2)
+    index = section_index(path)
+    assert [section.header[0] for section in index] == ['Section 0', 'Section 1', 'Section 2']
+    with open(path, 'rb') as file:
+        file.seek(index[1].start)
+        assert file.read(index[1].end - index[1].start).decode() == \
+            'Section 1,Name,Value\n,name 1-0,"0, 1"\n,name 1-1,"1, 2"\n'
+    assert (tmp_path / ('in.csv' + SECTION_INDEX_SUFFIX)).exists()
+    assert section_index(path) == index
+
+    write_sections(path, sections=4, rows=2)  # the index is stale
+    assert len(section_index(path)) == 4
+
+
+def test_process_csv_sections(tmp_path, upper_case_parser, write_sections):
+    input_path, output_path = tmp_path / 'in.csv', tmp_path / 'out.csv'
+    write_sections(input_path, sections=4, rows=2)
+    for options in ({}, {'columns': ('Name',)}):
+        parser = upper_case_parser()
+        process_csv(input_path, output_file_path=output_path, record_parser=parser, multiple_header=True,
+                    sections=['Section 2', 0], **options)
+        assert output_path.read_text().splitlines() == ['Section 0,Name,Value', ',NAME 0-0,"0, 1"', ',NAME 0-1,"1, 2"',
+                                                        'Section 2,Name,Value', ',NAME 2-0,"0, 1"', ',NAME 2-1,"1, 2"']
+        assert (parser.records, parser.sections) == (4, 2)
+    with pytest.raises(ValueError, match='Section 9'):
+        process_csv(input_path, record_parser=upper_case_parser(), sections=['Section 9'])
+
+
+def test_process_csv_compressed_sections(tmp_path, upper_case_parser, write_sections):
+    input_path, output_path = tmp_path / 'in.csv', tmp_path / 'out.csv'
+    write_sections(input_path, sections=4, rows=2)
+    compressed_path = tmp_path / 'in.csv.gz'
+    compressed_path.write_bytes(gzip.compress(b',record before the first header\n' + input_path.read_bytes()))
+    for options in ({}, {'columns': ('Name',)}):
+        expected = tmp_path / 'expected.csv'
+        process_csv(input_path, output_file_path=expected, record_parser=upper_case_parser(), multiple_header=True,
+                    sections=['Section 2', -4], **options)
+        parser = upper_case_parser()
+        process_csv(compressed_path, output_file_path=output_path, record_parser=parser, multiple_header=True,
+                    sections=['Section 2', -4], **options)
+        assert output_path.read_text() == expected.read_text()
+        assert (parser.records, parser.sections) == (4, 2)
+    assert not (tmp_path / ('in.csv.gz' + SECTION_INDEX_SUFFIX)).exists()
+    with pytest.raises(ValueError, match='compressed'):
+        section_index(compressed_path)
+    with pytest.raises(ValueError, match='no section 4'):
+        process_csv(compressed_path, record_parser=upper_case_parser(), sections=[4])
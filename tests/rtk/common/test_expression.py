@@ -1,4 +1,6 @@
-from rtk.common.expression import Expression
+import pytest
+
+from rtk.common.expression import ROWS, VECTORISED, BatchResolver, Expression
 
 
 def test_happy_path():
@@ -16,3 +18,120 @@ def test_invoke_function():
     _exp = Expression('run_func(${aa})')
     ret = _exp({'run_func': mock_func}, aa='a')
     assert ret == 'a'*10
+
+
+def test_compiled_once():
+    exp = Expression('${aa} + ${aa}')
+    assert exp._variables == [('aa', '__var_1')]
+    assert Expression('${aa} + ${aa}')._code is exp._code
+    assert exp(aa=2) == 4
+
+
+def test_register_resolver():
+    Expression.register_resolver('trade', lambda config_var, data_context: data_context['trade'][config_var[6:]])
+    try:
+        exp = Expression('${trade.qty} * 2')
+        assert exp(trade={'qty': 3}) == 6
+    finally:
+        Expression.unregister_resolver('trade')
+    # the compiled string is shared, its resolvers are not
+    assert Expression('${trade.qty} * 2')(**{'trade.qty': 4}) == 8
+    with pytest.raises(KeyError):
+        Expression.unregister_resolver('trade')
+
+
+def test_evaluate_batch_rows():
+    exp = Expression('run_func(${aa})')
+    result = exp.evaluate_batch({'aa': ['a', 'b']}, {'run_func': mock_func})
+    assert result == (['a' * 10, 'b' * 10], ROWS)
+    with pytest.raises(ValueError):
+        exp.evaluate_batch({'aa': ['a'], 'bb': []})
+
+
+def test_evaluate_batch_vectorised():
+    np = pytest.importorskip('numpy')
+    columns = {'qty': np.array([1, 2, 3]), 'price': [3.0, 2.0, 0.5]}
+    exp = Expression('${qty} * ${price} if ${qty} > 1 and not ${price} < 1 else -${qty}')
+    result = exp.evaluate_batch(columns)
+    assert result.path == VECTORISED
+    assert result.values.tolist() == [exp(qty=qty, price=price) for qty, price in zip([1, 2, 3], [3.0, 2.0, 0.5])]
+    # python semantics: division by zero falls back to the rows, raising
+    with pytest.raises(ZeroDivisionError):
+        Expression('${qty} / (${qty} - 2)').evaluate_batch(columns)
+    # integer overflow: python integers grow instead of wrapping around
+    assert Expression('${aa} * ${bb}').evaluate_batch({'aa': [2 ** 40], 'bb': [2 ** 40]}) == ([2 ** 80], ROWS)
+    assert Expression('${aa} ** 3').evaluate_batch({'aa': np.array([10 ** 7, 2])}) == ([10 ** 21, 8], ROWS)
+    assert Expression('-${aa}').evaluate_batch({'aa': np.array([-2 ** 63])}) == ([2 ** 63], ROWS)
+
+
+def test_lazy_resolution():
+    calls = []
+
+    def resolve(config_var, data_context):
+        calls.append(config_var)
+        return data_context['trade'][config_var[6:]]
+
+    Expression.register_resolver('trade', resolve)
+    try:
+        exp = Expression('${trade.qty} * ${trade.qty} if ${trade.live} else ${trade.price}')
+        assert exp(trade={'qty': 3, 'live': True}) == 9
+        assert calls == ['trade.live', 'trade.qty']  # once each, trade.price not reached
+    finally:
+        Expression.unregister_resolver('trade')
+
+
+def test_constant_folding():
+    exp = Expression('${aa} * (2 * 3) if 1 < 2 else ${bb}')
+    assert exp._compiled == '__var_1 * 6'
+    assert [variable[1] for variable in exp._resolved] == ['aa']
+    assert Expression('1 / 0 if ${aa} else 0')(aa=0) == 0  # left to raise when reached
+    assert Expression('True and ${aa} and 1')._compiled == '__var_1 and 1'
+    assert Expression('${aa} and 1')(aa='abc') == 1
+    assert Expression('${aa} or 0')(aa='') == 0
+    assert Expression('${aa} or 0 or ${bb}')(aa='', bb='x') == 'x'
+
+
+class PriceResolver(BatchResolver):
+    """resolve ${price.<field>} of data_context['ticker'], counting the fetches"""
+    def __init__(self, ttl=None):
+        super().__init__(ttl)
+        self.fetches = []
+
+    def fetch(self, config_vars, data_contexts):
+        self.fetches.append((config_vars, [data_context['ticker'] for data_context in data_contexts]))
+        return {config_var: [len(data_context['ticker']) * (2 if config_var == 'price.ask' else 1)
+                             for data_context in data_contexts] for config_var in config_vars}
+
+    def cache_key(self, data_context):
+        return data_context['ticker']
+
+
+def test_batch_resolver():
+    resolver = PriceResolver(ttl=60)
+    Expression.register_resolver('price', resolver)
+    try:
+        exp = Expression('${price.ask} - ${price.bid} + ${qty}')
+        contexts = [{'ticker': 'A', 'qty': 1}, {'ticker': 'BB', 'qty': 2}, {'ticker': 'A', 'qty': 3}]
+        assert exp.evaluate_many(contexts) == [2, 4, 4]
+        assert resolver.fetches == [(['price.ask', 'price.bid'], ['A', 'BB'])]  # once, each ticker once
+        assert exp.evaluate_many(contexts + [{'ticker': 'CCC', 'qty': 0}]) == [2, 4, 4, 3]
+        assert resolver.fetches[1:] == [(['price.ask', 'price.bid'], ['CCC'])]  # the others are cached
+        assert list(exp.evaluate_batch({'ticker': ['A', 'BB'], 'qty': [1, 2]}).values) == [2, 4]
+        assert len(resolver.fetches) == 2
+    finally:
+        Expression.unregister_resolver('price')
+
+
+class IdResolver(BatchResolver):
+    """resolve ${ref.k} to data_context['k'], cached by data_context['id'] if any"""
+    def fetch(self, config_vars, data_contexts):
+        return {config_var: [data_context['k'] for data_context in data_contexts] for config_var in config_vars}
+
+    def cache_key(self, data_context):
+        return data_context.get('id')
+
+
+def test_batch_resolver_keys_apart_from_rows():
+    resolver = IdResolver(ttl=60)
+    contexts = [{'k': 'first'}, {'id': 0, 'k': 'second'}]
+    assert resolver.resolve_batch(['ref.k'], contexts) == {'ref.k': ['first', 'second']}
@@ -0,0 +1,134 @@
+import json
+import pickle
+
+import pytest
+
+from rtk.common.base import MapperBase
+from rtk.common.fields import JsonField, ListField
+from rtk.common.meta import Field, FieldType
+
+
+class Leg(MapperBase):
+    currency = Field()
+
+
+class Swap(MapperBase):
+    legs = ListField(Leg)
+    tags = ListField(Field)
+    fixings = ListField(Field(type_=FieldType.Float))
+
+
+def test_elements_are_converted_once():
+    swap = Swap(legs=[{'currency': 'EUR'}, {'currency': 'USD'}])
+    first = list(swap.legs)
+    assert [leg.currency for leg in first] == ['EUR', 'USD']
+    assert all(a is b for a, b in zip(first, swap.legs))
+    assert first[1] in swap.legs
+    assert swap.legs.index(first[1]) == 1
+
+
+def test_cache_follows_mutations():
+    swap = Swap(tags=['a', 'b', 'c'], fixings=[1.5, 2.5])
+    tags = swap.tags
+    assert tags[1] == 'b'
+    tags.insert(0, 'z')
+    del tags[2]
+    tags[-1] = 'y'
+    assert list(tags) == ['z', 'a', 'y']
+    assert swap.generate()['tags'] == ['z', 'a', 'y']
+    assert tags.pop() == 'y' and tags.count('a') == 1
+
+    fixings = swap.fixings
+    assert 2.5 in fixings and 3.0 not in fixings
+    swap.fixings = [3.0]
+    assert list(swap.fixings) == [3.0]
+
+
+def test_membership_compares_python_values():
+    swap = Swap(tags=['1', 'b'], fixings=[2.5])
+    fixings, tags = swap.fixings, swap.tags
+    assert '2.5' not in fixings and fixings.count('2.5') == 0
+    assert fixings.index(2.5) == 0
+    with pytest.raises(ValueError):
+        fixings.index('2.5')
+    assert 1 not in tags and tags.count(1) == 0 and tags.count('1') == 1
+    assert 1 not in tags[:1] and '1' in tags[:1]
+
+
+def test_slices_are_views():
+    swap = Swap(tags=['a', 'b', 'c', 'd'])
+    view = swap.tags[1:3]
+    assert list(view) == ['b', 'c'] and len(view) == 2
+    view[0] = 'x'
+    assert list(swap.tags) == ['a', 'x', 'c', 'd']
+    assert list(view[::-1]) == ['c', 'x']
+
+
+class Message(MapperBase):
+    payload = JsonField()
+    header = Field(type_=FieldType.Json)
+
+
+def test_json_field_decodes_once():
+    decoded, encoded = [], []
+
+    def decoder(value):
+        decoded.append(value)
+        return json.loads(value)
+
+    def encoder(value):
+        encoded.append(value)
+        return json.dumps(value)
+
+    class Tracked(MapperBase):
+        payload = JsonField(encoder=encoder, decoder=decoder)
+
+    message = Tracked.build_from({'payload': '{"a": [1, 2]}'})
+    assert message.generate() == {'payload': '{"a": [1, 2]}'}
+    assert message.payload is message.payload
+    assert message.payload == {'a': [1, 2]}
+    assert len(decoded) == 2  # the document and its snapshot
+    assert message.generate() == {'payload': '{"a": [1, 2]}'}
+    assert not encoded  # only read: not encoded again
+
+    document = message.payload
+    document['b'] = True
+    message.payload = document
+    assert json.loads(message.generate()['payload']) == {'a': [1, 2], 'b': True}
+    assert message.payload is document and len(decoded) == 3 and len(encoded) == 1
+
+
+def test_json_field_in_place_edit():
+    message = Message.build_from({'payload': '{"a":1}'})
+    assert message.payload == {'a': 1}
+    assert message.generate() == {'payload': '{"a":1}'}  # unchanged: kept as read
+    message.payload['b'] = 1
+    assert json.loads(message.generate()['payload']) == {'a': 1, 'b': 1}
+    assert Message.generate_many([message]) == [message.generate()]
+
+    assigned = {'c': 1}
+    message.payload = assigned
+    assigned['c'] = 2
+    assert Message.generate_many([message]) == [{'payload': '{"c": 2}'}]
+    assert message.payload is assigned
+
+
+def test_cached_values_are_not_pickled():
+    swap = Swap(legs=[{'currency': 'EUR'}], tags=['a'])
+    message = Message.build_from({'payload': '{"a": 1}'})
+    assert swap.legs[0].currency == 'EUR' and message.payload == {'a': 1}
+    assert vars(swap) == {} and vars(message) == {}
+
+    copied = pickle.loads(pickle.dumps(swap))
+    assert copied.generate() == swap.generate()
+    assert copied.legs[0].currency == 'EUR'
+    message.payload['b'] = 2
+    copied = pickle.loads(pickle.dumps(message))
+    assert copied.generate() == message.generate() == {'payload': '{"a": 1, "b": 2}'}
+    assert copied.payload == {'a': 1, 'b': 2}
+
+
+def test_json_field_type():
+    message = Message(payload=[1, 'x'], header={'id': 7})
+    assert message.generate() == {'payload': '[1, "x"]', 'header': '{"id": 7}'}
+    assert message.header == {'id': 7}
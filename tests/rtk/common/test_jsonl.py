@@ -0,0 +1,39 @@
+import io
+from datetime import date
+
+from rtk.common.base import MapperBase
+from rtk.common.meta import Field, FieldType
+
+LINES = '\n'.join((
+    '{"id": "T1", "quantity": 1, "trade_date": "2019-11-01"}',
+    '{"id": "T2", "quantity": "x", "trade_date": "2019-13-01"}',
+    'not json',
+    '',
+    '{"id": "T3", "quantity": 3}',
+    '{"id": "T4", "quantity": 4, "trade_date": "2019-11-04"}',
+))
+
+
+class Trade(MapperBase):
+    trade_id = Field(name='id')
+    quantity = Field(type_=FieldType.Integer)
+    trade_date = Field(type_=FieldType.Date)
+
+
+def test_iter_jsonl_counts_errors(tmp_path):
+    path = tmp_path / 'trades.jsonl'
+    path.write_text(LINES)
+    reader = Trade.iter_jsonl(str(path), chunk_size=16)
+    trades = list(reader)
+    assert [trade.trade_id for trade in trades] == ['T1', 'T3', 'T4']
+    assert trades[0].trade_date == date(2019, 11, 1)
+    assert (reader.lines, reader.rejected, reader.malformed) == (5, 1, 1)
+    assert reader.errors == {'quantity': 1, 'trade_date': 1}
+
+
+def test_iter_jsonl_batches():
+    reader = Trade.iter_jsonl(io.StringIO(LINES), chunk_size=7, batch_size=2)
+    batches = list(reader)
+    assert [len(batch) for batch in batches] == [2, 1]
+    assert batches[0].values('trade_id') == ['T1', 'T3']
+    assert batches[1][0].quantity == 4
@@ -0,0 +1,203 @@
+from datetime import date, datetime
+
+import pytest
+
+from rtk.common.base import MapperBase, type_cache
+from rtk.common.fields import ListField, ObjField
+from rtk.common.meta import Field, FieldType, cache_dates, convert_to_python_date, convert_to_python_datetime
+
+
+class Child(MapperBase):
+    code = Field()
+    label = Field(name='display')
+
+
+class Parent(MapperBase):
+    code = Field()
+    child = ObjField(Child)
+
+
+class DescriptorParent(Parent, codec=False):
+    extra = Field()
+
+
+class CustomInit(Parent):
+    def __init__(self, **values):
+        super().__init__(**values)
+        self.custom = True
+
+
+def test_compiled_init_matches_descriptor_path():
+    values = dict(code='P1', child={'code': 'C1', 'label': 'one'})
+    compiled = Parent(**values)
+    assert Parent.__init__ is not MapperBase.__init__
+    assert compiled.generate() == {'code': 'P1', 'child': {'code': 'C1', 'display': 'one'}}
+    assert compiled.child.label == 'one'
+
+    descriptor = DescriptorParent(**values)
+    assert DescriptorParent.__init__ is MapperBase.__init__
+    assert descriptor.generate() == dict(compiled.generate(), extra=None)
+
+
+def test_compiled_build_from_skips_init():
+    data = {'code': 'P2'}
+    instance = Parent.build_from(data)
+    assert instance.generate() is data
+    assert instance.code == 'P2'
+    assert instance.child == {}
+
+
+def test_custom_init_is_kept():
+    instance = CustomInit(code='P3')
+    assert instance.custom
+    assert CustomInit.build_from({'code': 'P4'}).custom
+
+
+class CustomInitWithFields(Parent):
+    extra = Field()
+
+    def __init__(self, **values):
+        super().__init__(**values)
+        self.custom = True
+
+
+def test_custom_init_with_fields_keeps_them():
+    instance = CustomInitWithFields(code='P5', extra='x')
+    assert instance.custom
+    assert instance.generate() == dict(Parent(code='P5').generate(), extra='x')
+
+
+def test_converters_are_per_field():
+    mapper = MapperBase.create_type_from(count=Field(type_=FieldType.Integer),
+                                         rate=Field(type_=FieldType.Float),
+                                         start=Field(type_=FieldType.Date))
+    instance = mapper(count=3, rate=0.5, start=date(2019, 11, 1))
+    assert instance.generate() == {'count': 3, 'rate': '0.5', 'start': '2019-11-01'}
+    assert (instance.count, instance.rate, instance.start) == (3, 0.5, date(2019, 11, 1))
+
+
+def test_build_and_generate_many():
+    rows = [{'code': str(i), 'display': 'child %d' % i} for i in range(3)]
+    instances = Child.build_many(rows)
+    assert [instance.label for instance in instances] == ['child 0', 'child 1', 'child 2']
+    assert Child.generate_many(instances) == rows
+
+    lazy = Child.build_many(iter(rows), lazy=True)
+    assert not isinstance(lazy, list)
+    assert list(Child.generate_many(lazy, lazy=True)) == rows
+
+
+class CompactChild(MapperBase, compact=True):
+    code = Field()
+    count = Field(type_=FieldType.Integer)
+
+
+class CompactGrandChild(CompactChild):
+    label = Field(name='display')
+
+
+def test_compact_storage():
+    instance = CompactGrandChild(code='C1', label='one')
+    assert not hasattr(instance, '__dict__')
+    assert instance.generate() == {'code': 'C1', 'count': 0, 'display': 'one'}
+    assert (instance.code, instance.count, instance.label) == ('C1', 0, 'one')
+    assert instance['display'] == 'one'
+    assert instance.get('missing', 'x') == 'x'
+    assert dict(instance.items()) == instance.generate()
+
+    instance.count = 5
+    del instance['display']
+    assert instance.generate() == {'code': 'C1', 'count': 5}
+    assert instance.label is None
+
+
+def test_mapper_base_instances():
+    assert MapperBase().generate() == {}
+    assert MapperBase.build_from({'code': 'x'})['code'] == 'x'
+
+
+def test_compact_build_from():
+    instance = CompactGrandChild.build_from({'code': 'C2'})
+    assert instance.generate() == {'code': 'C2'}
+    assert len(instance) == 1
+    assert instance.count == 0
+    assert CompactGrandChild.generate_many(CompactGrandChild.build_many([{'code': 'C3'}])) == [{'code': 'C3'}]
+
+
+class CompactCustomInit(CompactChild):
+    extra = Field()
+
+    def __init__(self, **values):
+        super().__init__(**values)
+
+    def generate(self):
+        return super().generate()
+
+
+def test_compact_custom_init_with_fields_keeps_them():
+    instance = CompactCustomInit(code='C4', extra='y')
+    assert instance.generate() == {'code': 'C4', 'count': 0, 'extra': 'y'}
+    assert CompactChild(code='C5').generate() == {'code': 'C5', 'count': 0}
+
+
+class CompactOfChild(Child, compact=True):
+    count = Field(type_=FieldType.Integer)
+
+
+def test_compact_over_non_compact_parent():
+    instance = CompactOfChild(code='C6', label='six')
+    assert (instance.code, instance.label, instance.count) == ('C6', 'six', 0)
+    assert instance.generate() == {'code': 'C6', 'display': 'six', 'count': 0}
+    assert CompactOfChild.build_from({'display': 'seven'}).label == 'seven'
+    assert Child(code='C7').generate() == {'code': 'C7', 'display': None}
+
+    class Tagged(MapperBase):
+        tags = ListField(Field)
+
+    with pytest.raises(TypeError, match='field tags of ListField'):
+        class CompactTagged(Tagged, compact=True):
+            pass
+
+
+def test_date_converters():
+    assert convert_to_python_date('2019-11-01') == date(2019, 11, 1)
+    assert convert_to_python_date('2019-1-1') == date(2019, 1, 1)
+    assert convert_to_python_datetime('2019-11-01T12:30:15.25Z') == datetime(2019, 11, 1, 12, 30, 15, 250000)
+    with pytest.raises(ValueError, match='Invalid ISO date: 2019-13-01'):
+        convert_to_python_date('2019-13-01')
+    with pytest.raises(ValueError, match='Invalid ISO date/time'):
+        convert_to_python_datetime('2019-11-01T12:30:15Z')
+    # rejected by strptime, not to be accepted by the fast path
+    for value in ('2019-11-01T12:30:15.1+01Z', '2019-11-01T12:30:15.1 Z', '2019-W01-1T12:30:15.25Z'):
+        with pytest.raises(ValueError, match='Invalid ISO date/time'):
+            convert_to_python_datetime(value)
+    with pytest.raises(ValueError, match='Invalid ISO date: 2019-W01-1'):
+        convert_to_python_date('2019-W01-1')
+
+    cache_dates(16)
+    try:
+        assert convert_to_python_date('2019-11-01') is convert_to_python_date('2019-11-01')
+    finally:
+        cache_dates(0)
+
+
+def test_create_type_from_is_cached():
+    type_cache.clear()
+    first = MapperBase.create_type_from(code=Field(), child=ObjField(Child, default={'code': 'x'}))
+    second = MapperBase.create_type_from(code=Field(), child=ObjField(Child, default={'code': 'x'}))
+    other = MapperBase.create_type_from(code=Field(), child=ObjField(Child, default={'code': 'y'}))
+    assert first is second
+    assert other is not first
+    assert type_cache.info() == (1, 2, type_cache.maxsize, 2)
+    # the same field objects, named by the first call
+    fields = dict(code=Field(), label=Field(name='display'))
+    assert MapperBase.create_type_from(**fields) is MapperBase.create_type_from(**fields)
+    assert type_cache.info() == (2, 3, type_cache.maxsize, 3)
+
+    type_cache.maxsize = 1
+    try:
+        assert MapperBase.create_type_from(code=Field()) is not first
+        assert MapperBase.create_type_from(code=Field(), child=ObjField(Child, default={'code': 'x'})) is not first
+        assert type_cache.info().currsize == 1
+    finally:
+        type_cache.maxsize = 256
@@ -0,0 +1,52 @@
+import pytest
+
+from rtk.common.csvutil import iter_sections, process_csv
+from rtk.common.pipeline import batch, filter_rows, map_rows, parse_records, pipe, threaded, write_csv
+
+
+def test_iter_sections(tmp_path, write_sections):
+    path = tmp_path / 'in.csv'
+    write_sections(path, sections=3, rows=4)
+    sections = iter_sections(path)
+    header, rows = next(sections)
+    assert header == ['Section 0', 'Name', 'Value']
+    assert next(rows) == ['', 'name 0-0', '0, 1']
+    # the rows left are skipped
+    assert [(header[0], len(list(rows))) for header, rows in sections] == [('Section 1', 4), ('Section 2', 4)]
+
+
+def test_pipe(tmp_path, write_sections):
+    input_path = tmp_path / 'in.csv'
+    write_sections(input_path, sections=2, rows=4)
+    sections = pipe(iter_sections(input_path),
+                    filter_rows(lambda row: not row[1].endswith('-3')),
+                    map_rows(lambda row: row[:2]),
+                    batch(2))
+    assert [(header[0], [len(rows_batch) for rows_batch in rows]) for header, rows in sections] == \
+           [('Section 0', [2, 1]), ('Section 1', [2, 1])]
+
+
+@pytest.mark.parametrize('stages', [(), (threaded(maxsize=2, chunk_rows=3),)])
+def test_write_csv(tmp_path, stages, upper_case_parser, write_sections):
+    input_path = tmp_path / 'in.csv'
+    write_sections(input_path)
+    process_csv(input_path, output_file_path=tmp_path / 'expected.csv', record_parser=upper_case_parser(),
+                multiple_header=True)
+    parser = upper_case_parser()
+    count = pipe(iter_sections(input_path), parse_records(parser), *stages, write_csv(tmp_path / 'out.csv'))
+    assert count == parser.records == 60
+    assert (tmp_path / 'out.csv').read_text() == (tmp_path / 'expected.csv').read_text()
+
+
+def test_threaded_early_stop_and_error(tmp_path, write_sections):
+    input_path = tmp_path / 'in.csv'
+    write_sections(input_path, sections=50)
+    for header, rows in pipe(iter_sections(input_path), threaded(maxsize=1, chunk_rows=1)):
+        break  # the producer thread stops
+
+    def fail(row):
+        raise ValueError(row[1])
+
+    with pytest.raises(ValueError, match='name 0-0'):
+        for header, rows in pipe(iter_sections(input_path), map_rows(fail), threaded()):
+            list(rows)
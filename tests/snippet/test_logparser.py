@@ -0,0 +1,160 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from snippet import logparser
+from snippet.logparser import (CompactRecordSet, LogIndex, LogRecord, RecordColumns, RecordSet, from_microseconds,
+                               parse_timestamp, parse_timestamp_micros, to_microseconds)
+
+SEVERITIES = ('INFO', 'DEBUG', 'WARNING', 'ERROR')
+
+
+def write_log(path, records=400, start=datetime(2019, 11, 1), step=timedelta(milliseconds=1700)):
+    timestamp = start
+    with open(path, 'w') as file:
+        file.write('header line before the first record\n')
+        for index in range(records):
+            timestamp += step
+            file.write('{}{:03d}: {:<7} : [{}] : step {} done\n'.format(
+                timestamp.strftime('%d %b %Y, %H:%M:%S.'), timestamp.microsecond // 1000,
+                SEVERITIES[index % len(SEVERITIES)], 100 + index % 3, index))
+            if index % 7 == 0:
+                file.write('    detail of record {}\n\n'.format(index))
+    return str(path)
+
+
+def records_of(record_set):
+    return [(record.props, record.original) for record in record_set]
+
+
+@pytest.fixture
+def log_path(tmp_path):
+    return write_log(tmp_path / 'calc_log_eod_inst1_20191101.log')
+
+
+@pytest.mark.parametrize('criteria', [dict(time_range='2019-11-01 00:02:00,2019-11-01 00:05:00'),
+                                      dict(time_range='2019-11-01 00:09:00,', severity='ERROR'),
+                                      dict(severity='WARNING', pid=101),
+                                      dict(severity='FATAL'),
+                                      dict(pid=102, keyword='step 1')])
+def test_indexed_from_file(log_path, criteria):
+    expected = records_of(RecordSet.from_file(log_path).where(**criteria))
+    assert records_of(RecordSet.from_file(log_path, **criteria)) == expected
+    assert os.path.exists(log_path + LogIndex.SUFFIX)
+    assert records_of(RecordSet.from_file(log_path, **criteria)) == expected  # from the saved index
+
+
+def test_index_rebuilt_when_stale(log_path):
+    first = LogIndex.open(log_path)
+    with open(log_path, 'a') as file:
+        file.write('01 Nov 2019, 23:00:00.000: ERROR   : [100] : appended\n')
+    index = LogIndex.open(log_path)
+    assert len(index) == len(first) + 1
+    assert index.read(index.where(severity='ERROR'))[-1].original == 'appended'
+
+    with open(log_path + LogIndex.SUFFIX, 'wb') as file:
+        file.write(b'not an index')
+    assert len(LogIndex.open(log_path)) == len(index)
+
+
+@pytest.mark.parametrize('workers', [1, 3])
+def test_parallel_load_file(log_path, monkeypatch, workers):
+    monkeypatch.setattr(logparser, 'MIN_CHUNK_SIZE', 512)  # several chunks
+    expected = RecordSet.from_file(log_path)
+    records = RecordSet('inst1')
+    records.load_file(log_path, workers=workers)
+    assert records_of(records) == records_of(expected)
+
+
+def test_load_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(logparser, 'MIN_CHUNK_SIZE', 512)
+    paths = [write_log(tmp_path / 'calc_log_eod_inst{}_20191101.log'.format(index), 100 + index * 50,
+                       step=timedelta(milliseconds=900 + index * 500)) for index in range(3)]
+    serial = [RecordSet.from_file(path) for path in paths]
+    records = RecordSet.load_files(paths, workers=2)
+    assert records.instance == 'inst0,inst1,inst2'
+    assert len(records) == sum(map(len, serial))
+    timestamps = [record.props.timestamp for record in records]
+    assert timestamps == sorted(timestamps)
+    for serial_records in serial:  # each file keeps its numbering and order
+        expected = records_of(serial_records)
+        assert [item for item in records_of(records) if item in expected] == expected
+
+    # a file out of timestamp order: the records are sorted, not merged
+    paths.append(write_log(tmp_path / 'calc_log_eod_back_20191101.log', 50, start=datetime(2019, 11, 1, 0, 1),
+                           step=timedelta(seconds=-1)))
+    records = RecordSet.load_files(paths, workers=2)
+    timestamps = [record.props.timestamp for record in records]
+    assert len(records) == sum(map(len, serial)) + 50
+    assert timestamps == sorted(timestamps)
+
+
+@pytest.mark.parametrize('text', ['01 Nov 2019, 10:20:30.123', '29 Feb 2020, 23:59:59.999', '01 Jan 1970, 00:00:00.000',
+                                  '1 Nov 2019, 10:20:30.5', '01 Nov 2019, 10:20:30.123456'])
+def test_parse_timestamp(text):
+    expected = datetime.strptime(text, LogRecord.TIME_FMT)
+    assert parse_timestamp(text) == expected
+    assert parse_timestamp_micros(text) == to_microseconds(expected)
+    assert from_microseconds(parse_timestamp_micros(text)) == expected
+
+
+@pytest.mark.parametrize('text', ['01 Foo 2019, 10:20:30.123', '30 Feb 2019, 10:20:30.123', '01 Nov 2019, 24:00:00.000',
+                                  '01 Nov 2019, 10:60:30.123', '01 Nov 2019, 10:20:30.12x', '',
+                                  # int() accepts these, strptime does not
+                                  '01 Nov 2019, 10:20:30.+12', '01 Nov 2019, 10:20:30.1_2', '+1 Nov 2019, 10:20:30.123',
+                                  '01 Nov 2019, 10:20: 1.123'])
+def test_parse_invalid_timestamp(text):
+    with pytest.raises(ValueError):
+        parse_timestamp(text)
+    with pytest.raises(ValueError):
+        parse_timestamp_micros(text)
+
+
+def test_epoch_micros(log_path):
+    records = RecordSet.from_file(log_path)
+    micros = RecordSet.from_file(log_path, epoch_micros=True)
+    assert [to_microseconds(record.props.timestamp) for record in records] == \
+        [record.props.timestamp for record in micros]
+    criteria = dict(time_range='2019-11-01 00:02:00,2019-11-01 00:05:00')
+    assert [record.props.seq for record in micros.where(**criteria)] == \
+        [record.props.seq for record in records.where(**criteria)]
+
+
+@pytest.mark.parametrize('criteria', [dict(severity='ERROR'), dict(severity='FATAL'),
+                                      dict(pid=101, time_range='2019-11-01 00:02:00,2019-11-01 00:05:00'),
+                                      dict(keyword='step 1', severity='INFO')])
+def test_compact_record_set_where(log_path, criteria):
+    records = RecordSet.from_file(log_path)
+    compact = CompactRecordSet.from_file(log_path)
+    assert isinstance(compact.data, RecordColumns)
+    assert records_of(compact) == records_of(records)
+    result = compact.where(**criteria)
+    assert isinstance(result, CompactRecordSet)
+    assert records_of(result) == records_of(records.where(**criteria))
+    assert compact.count(**criteria) == records.count(**criteria)
+
+
+def test_compact_record_set_select_and_merge(tmp_path, log_path):
+    other_path = write_log(tmp_path / 'calc_log_eod_inst2_20191101.log', 100, step=timedelta(seconds=3))
+    records, other = RecordSet.from_file(log_path), RecordSet.from_file(other_path)
+    compact, compact_other = CompactRecordSet.from_file(log_path), CompactRecordSet.from_file(other_path)
+    assert compact.select(r'step (\d+) done') == records.select(r'step (\d+) done')
+    merged = compact + compact_other
+    assert isinstance(merged, CompactRecordSet)
+    assert records_of(merged) == records_of(records + other)
+    for record_set in (records, compact):
+        tail = record_set[-2:]
+        assert isinstance(tail, type(record_set)) and tail.instance == 'inst1'
+        assert [record.props.seq for record in tail] == [len(records) - 2, len(records) - 1]
+        assert records_of(tail) == records_of(records)[-2:]
+        assert records_of(record_set[1:6:2]) == [records_of(records)[i] for i in (1, 3, 5)]
+    assert compact[-2:].data.epoch_micros is False
+
+
+def test_compact_record_set_epoch_micros(log_path):
+    compact = CompactRecordSet.from_file(log_path, epoch_micros=True)
+    assert records_of(compact) == records_of(RecordSet.from_file(log_path, epoch_micros=True))
+    assert records_of(compact.where(severity='ERROR')) == \
+        records_of(RecordSet.from_file(log_path, epoch_micros=True, severity='ERROR'))
+    assert records_of(CompactRecordSet.load_files([log_path], workers=2, epoch_micros=True)) == records_of(compact)